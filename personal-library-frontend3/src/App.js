@@ -136,11 +136,26 @@ function App() {
     }
 
     try {
-      const response = await authFetch(`${API_BASE_URL}/books/`);
-      
-      if (response.ok) {
+      let allBooks = [];
+      let cursor = null;
+      let response;
+
+      do {
+        const params = new URLSearchParams({ limit: '200' });
+        if (cursor) {
+          params.set('cursor', cursor);
+        }
+        response = await authFetch(`${API_BASE_URL}/books/?${params}`);
+        if (!response.ok) {
+          break;
+        }
         const data = await response.json();
-        setBooks(data);
+        allBooks = allBooks.concat(data.items);
+        cursor = data.next_cursor;
+      } while (cursor);
+
+      if (response.ok) {
+        setBooks(allBooks);
         setUseMockData(false);
       } else {
         console.warn('Бэкенд недоступен, используем моковые данные');
@@ -2,6 +2,9 @@ import React, { useState, useEffect, useRef } from 'react';
 import './Chat.css';
 
 const API_BASE_URL = 'http://localhost:8000';
+const WS_URL = API_BASE_URL.replace(/^http/, 'ws') + '/ws';
+// Пауза перед перезагрузкой списка диалогов, когда пишет пользователь, которого в нем нет
+const CONVERSATIONS_REFETCH_DELAY_MS = 500;
 
 const refreshAuthToken = async () => {
   const refreshToken = localStorage.getItem('refresh_token');
@@ -68,7 +71,13 @@ const Chat = () => {
   const [socket, setSocket] = useState(null);
   const [isConnected, setIsConnected] = useState(false);
   const [isTyping, setIsTyping] = useState(false);
+  const [olderCursor, setOlderCursor] = useState(null);
+  const [conversations, setConversations] = useState([]);
+  const [selectedUserId, setSelectedUserId] = useState(null);
   const messagesEndRef = useRef(null);
+  // Обработчик WebSocket создается один раз, поэтому актуальный список диалогов читается через ref
+  const conversationsRef = useRef([]);
+  const conversationsRefetchRef = useRef(null);
 
   const handleLogout = () => {
     localStorage.removeItem('token');
@@ -96,16 +105,24 @@ const Chat = () => {
 
   const currentUser = getCurrentUser();
 
-  const fetchChatHistory = async () => {
+  const formatHistory = (items) => items
+    .slice()
+    .reverse()
+    .map(msg => ({
+      ...msg,
+      email: msg.is_admin ? 'Администратор' : (msg.email || `Пользователь ${msg.user_id}`)
+    }));
+
+  // Сервер отдает историю от новых к старым; before — курсор для загрузки более старых сообщений
+  const fetchChatHistory = async (before = null) => {
     try {
-      const response = await authFetch(`${API_BASE_URL}/chat/messages?limit=50`);
+      const query = before ? `&before=${encodeURIComponent(before)}` : '';
+      const response = await authFetch(`${API_BASE_URL}/chat/messages?limit=50${query}`);
       if (response.ok) {
         const data = await response.json();
-        const formattedMessages = data.map(msg => ({
-          ...msg,
-          email: msg.is_admin ? 'Администратор' : (msg.email || `Пользователь ${msg.user_id}`)
-        }));
-        setMessages(formattedMessages);
+        const formattedMessages = formatHistory(data.items);
+        setMessages(prev => before ? [...formattedMessages, ...prev] : formattedMessages);
+        setOlderCursor(data.next_cursor);
       } else {
         console.error('Ошибка при загрузке истории сообщений:', response.status);
       }
@@ -114,6 +131,63 @@ const Chat = () => {
     }
   };
 
+  // Список диалогов администратора: сводка по пользователям с числом непрочитанных
+  const fetchConversations = async () => {
+    try {
+      const response = await authFetch(`${API_BASE_URL}/chat/conversations?limit=50`);
+      if (response.ok) {
+        const data = await response.json();
+        setConversations(data.items);
+      } else {
+        console.error('Ошибка при загрузке диалогов:', response.status);
+      }
+    } catch (error) {
+      console.error('Ошибка при загрузке диалогов:', error);
+    }
+  };
+
+  // Несколько сообщений от новых пользователей подряд — один запрос списка диалогов
+  const scheduleConversationsRefetch = () => {
+    if (conversationsRefetchRef.current) return;
+    conversationsRefetchRef.current = setTimeout(() => {
+      conversationsRefetchRef.current = null;
+      fetchConversations();
+    }, CONVERSATIONS_REFETCH_DELAY_MS);
+  };
+
+  // Сообщение пользователя обновляет его диалог на месте, как это делает сервер, и поднимает его наверх
+  const applyUserMessage = (data) => {
+    if (!conversationsRef.current.some(conv => conv.user_id === data.user_id)) {
+      scheduleConversationsRefetch();
+      return;
+    }
+    setConversations(prev => {
+      const conv = prev.find(item => item.user_id === data.user_id);
+      if (!conv) return prev;
+      const updated = {
+        ...conv,
+        last_message: data.message,
+        last_message_id: data.message_id || conv.last_message_id,
+        last_message_at: data.timestamp || new Date().toISOString(),
+        last_is_admin: 0,
+        unread_count: conv.unread_count + 1
+      };
+      return [updated, ...prev.filter(item => item !== conv)];
+    });
+  };
+
+  const selectConversation = async (userId) => {
+    setSelectedUserId(userId);
+    setConversations(prev => prev.map(conv => (
+      conv.user_id === userId ? { ...conv, unread_count: 0 } : conv
+    )));
+    try {
+      await authFetch(`${API_BASE_URL}/chat/conversations/${userId}/read`, { method: 'POST' });
+    } catch (error) {
+      console.error('Ошибка при отметке диалога прочитанным:', error);
+    }
+  };
+
   const sendMessageViaAPI = async (messageText) => {
     try {
       const response = await authFetch(`${API_BASE_URL}/chat/messages`, {
@@ -146,8 +220,11 @@ const Chat = () => {
     }
 
     fetchChatHistory();
+    if (currentUser?.role === 'admin') {
+      fetchConversations();
+    }
 
-    const ws = new WebSocket('ws://localhost:8080');
+    const ws = new WebSocket(WS_URL);
 
     ws.onopen = (e) => {
       console.log('WebSocket соединение установлено');
@@ -160,8 +237,7 @@ const Chat = () => {
 
       setTimeout(() => {
         ws.send(JSON.stringify({
-          type: 'get_history',
-          token: token
+          type: 'get_history'
         }));
       }, 500);
     };
@@ -192,6 +268,7 @@ const Chat = () => {
           };
           
           setMessages(prev => [...prev, newMessage]);
+          applyUserMessage(data);
           
         } else if (data.type === 'admin_message') {
           const newMessage = {
@@ -207,11 +284,9 @@ const Chat = () => {
           
         } else if (data.type === 'chat_history') {
           
-          const formattedMessages = (data.messages || []).map(msg => ({
-            ...msg,
-            email: msg.is_admin ? 'Администратор' : (msg.email || `Пользователь ${msg.user_id}`)
-          }));
-          setMessages(formattedMessages);
+          const formattedMessages = formatHistory(data.messages || []);
+          setMessages(prev => data.before ? [...formattedMessages, ...prev] : formattedMessages);
+          setOlderCursor(data.next_cursor);
           
         } else if (data.type === 'message_sent') {
           console.log('Сообщение доставлено:', data.message_id);
@@ -223,6 +298,19 @@ const Chat = () => {
           setIsTyping(true);
         } else if (data.type === 'typing_stop') {
           setIsTyping(false);
+        } else if (data.type === 'reauth_required') {
+          // rejected — кадр, отклоненный из-за истекшего токена: сервер обработает его после reauth
+          refreshAuthToken()
+            .then((freshToken) => {
+              ws.send(JSON.stringify({
+                type: 'reauth',
+                token: freshToken
+              }));
+              if (data.rejected) {
+                ws.send(JSON.stringify(data.rejected));
+              }
+            })
+            .catch(() => handleLogout());
         } else if (data.type === 'auth_error') {
           console.error('Ошибка аутентификации в WebSocket:', data.message);
           handleLogout();
@@ -235,12 +323,17 @@ const Chat = () => {
     setSocket(ws);
 
     return () => {
+      clearTimeout(conversationsRefetchRef.current);
       if (ws.readyState === WebSocket.OPEN) {
         ws.close();
       }
     };
   }, []);
 
+  useEffect(() => {
+    conversationsRef.current = conversations;
+  }, [conversations]);
+
   useEffect(() => {
     messagesEndRef.current?.scrollIntoView({ 
       behavior: 'smooth',
@@ -251,14 +344,10 @@ const Chat = () => {
   const sendMessage = async () => {
     if (!newMessage.trim() || !socket || !isConnected) return;
 
-    const token = localStorage.getItem('token');
-    
-    
     const messageType = currentUser?.role === 'admin' ? 'admin_message' : 'message';
     
     socket.send(JSON.stringify({
       type: messageType,
-      token: token,
       message: newMessage.trim(),
       ...(currentUser?.role === 'admin' && { target_user_id: getTargetUserId() }) 
     }));
@@ -287,6 +376,7 @@ const Chat = () => {
   };
 
   const getTargetUserId = () => {
+    if (selectedUserId) return selectedUserId;
     if (messages.length === 0) return null;
     
     const lastUserMessage = [...messages].reverse().find(msg => !msg.is_admin);
@@ -304,17 +394,14 @@ const Chat = () => {
     setNewMessage(e.target.value);
     
     if (socket && isConnected) {
-      const token = localStorage.getItem('token');
       socket.send(JSON.stringify({
-        type: 'typing_start',
-        token: token
+        type: 'typing_start'
       }));
       
       setTimeout(() => {
         if (socket && isConnected) {
           socket.send(JSON.stringify({
-            type: 'typing_stop',
-            token: token
+            type: 'typing_stop'
           }));
         }
       }, 1000);
@@ -389,6 +476,24 @@ const Chat = () => {
           </div>
         </div>
 
+        {currentUser?.role === 'admin' && conversations.length > 0 && (
+          <div className="conversations-list">
+            {conversations.map(conv => (
+              <button
+                key={conv.user_id}
+                className={`conversation-item ${conv.user_id === selectedUserId ? 'selected' : ''}`}
+                onClick={() => selectConversation(conv.user_id)}
+              >
+                <span className="conversation-email">{conv.email || `Пользователь ${conv.user_id}`}</span>
+                <span className="conversation-last">{conv.last_message}</span>
+                {conv.unread_count > 0 && (
+                  <span className="conversation-unread">{conv.unread_count}</span>
+                )}
+              </button>
+            ))}
+          </div>
+        )}
+
         <div className="messages-container">
           {messages.length === 0 ? (
             <div className="no-messages">
@@ -404,7 +509,15 @@ const Chat = () => {
               </p>
             </div>
           ) : (
-            Object.entries(messageGroups).map(([date, dateMessages]) => (
+            <>
+            {olderCursor && (
+              <div className="load-older">
+                <button onClick={() => fetchChatHistory(olderCursor)}>
+                  Показать более ранние сообщения
+                </button>
+              </div>
+            )}
+            {Object.entries(messageGroups).map(([date, dateMessages]) => (
               <div key={date}>
                 <div className="date-divider">
                   <span>{formatDate(dateMessages[0].created_at)}</span>
@@ -428,7 +541,8 @@ const Chat = () => {
                   );
                 })}
               </div>
-            ))
+            ))}
+            </>
           )}
           
           {isTyping && (
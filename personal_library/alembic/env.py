@@ -13,8 +13,12 @@ sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 # Импортируем все модели
 from app.database import Base
 from app.models.book import Book
+from app.models.book_stats import BookStat
+from app.models.book_change import BookChange
+from app.models.library_version import LibraryVersion
 from app.models.user import User
 from app.models.chat import ChatMessage
+from app.models.chat_conversation import ChatConversation
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -29,6 +33,12 @@ if config.config_file_name is not None:
 # for 'autogenerate' support
 target_metadata = Base.metadata
 
+def include_object(object, name, type_, reflected, compare_to):
+    # Виртуальная таблица FTS5 и ее теневые таблицы создаются миграцией вручную
+    if type_ == "table" and name.startswith("books_fts"):
+        return False
+    return True
+
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode."""
     url = config.get_main_option("sqlalchemy.url")
@@ -37,7 +47,8 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
-        render_as_batch=True
+        render_as_batch=True,
+        include_object=include_object
     )
 
     with context.begin_transaction():
@@ -55,7 +66,8 @@ def run_migrations_online() -> None:
         context.configure(
             connection=connection, 
             target_metadata=target_metadata,
-            render_as_batch=True
+            render_as_batch=True,
+            include_object=include_object
         )
 
         with context.begin_transaction():
@@ -0,0 +1,83 @@
+"""журнал изменений книг для инкрементальной синхронизации
+
+Revision ID: a4d2e8b1c795
+Revises: f3c7a9e2d416
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4d2e8b1c795'
+down_revision: Union[str, Sequence[str], None] = 'f3c7a9e2d416'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _drop_version_triggers() -> None:
+    op.execute("DROP TRIGGER IF EXISTS library_versions_au")
+    op.execute("DROP TRIGGER IF EXISTS library_versions_ad")
+    op.execute("DROP TRIGGER IF EXISTS library_versions_ai")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('book_changes',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('seq', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('book_id', sa.Integer(), nullable=False),
+    sa.Column('op', sa.String(length=10), nullable=False),
+    sa.PrimaryKeyConstraint('user_id', 'seq')
+    )
+    # Существующие книги в журнал не попадают: клиенты с since=0 получат сигнал полной синхронизации
+    _drop_version_triggers()
+    op.execute("""
+        CREATE TRIGGER library_versions_ai AFTER INSERT ON books BEGIN
+            INSERT INTO library_versions (user_id, version) SELECT new.user_id, 1 WHERE new.user_id IS NOT NULL ON CONFLICT (user_id) DO UPDATE SET version = version + 1;
+            INSERT INTO book_changes (user_id, seq, book_id, op) SELECT user_id, version, new.id, 'upsert' FROM library_versions WHERE user_id = new.user_id;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER library_versions_ad AFTER DELETE ON books BEGIN
+            INSERT INTO library_versions (user_id, version) SELECT old.user_id, 1 WHERE old.user_id IS NOT NULL ON CONFLICT (user_id) DO UPDATE SET version = version + 1;
+            INSERT INTO book_changes (user_id, seq, book_id, op) SELECT user_id, version, old.id, 'delete' FROM library_versions WHERE user_id = old.user_id;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER library_versions_au AFTER UPDATE ON books BEGIN
+            INSERT INTO library_versions (user_id, version) SELECT old.user_id, 1 WHERE old.user_id IS NOT NULL ON CONFLICT (user_id) DO UPDATE SET version = version + 1;
+            INSERT INTO book_changes (user_id, seq, book_id, op) SELECT user_id, version, old.id, CASE WHEN new.user_id IS old.user_id THEN 'upsert' ELSE 'delete' END FROM library_versions WHERE user_id = old.user_id;
+            INSERT INTO library_versions (user_id, version) SELECT new.user_id, 1
+            WHERE new.user_id IS NOT NULL AND new.user_id IS NOT old.user_id
+            ON CONFLICT (user_id) DO UPDATE SET version = version + 1;
+            INSERT INTO book_changes (user_id, seq, book_id, op) SELECT user_id, version, new.id, 'upsert' FROM library_versions WHERE user_id = new.user_id AND new.user_id IS NOT old.user_id;
+        END
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    _drop_version_triggers()
+    op.execute("""
+        CREATE TRIGGER library_versions_ai AFTER INSERT ON books BEGIN
+            INSERT INTO library_versions (user_id, version) SELECT new.user_id, 1 WHERE new.user_id IS NOT NULL ON CONFLICT (user_id) DO UPDATE SET version = version + 1;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER library_versions_ad AFTER DELETE ON books BEGIN
+            INSERT INTO library_versions (user_id, version) SELECT old.user_id, 1 WHERE old.user_id IS NOT NULL ON CONFLICT (user_id) DO UPDATE SET version = version + 1;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER library_versions_au AFTER UPDATE ON books BEGIN
+            INSERT INTO library_versions (user_id, version) SELECT old.user_id, 1 WHERE old.user_id IS NOT NULL ON CONFLICT (user_id) DO UPDATE SET version = version + 1;
+            INSERT INTO library_versions (user_id, version) SELECT new.user_id, 1
+            WHERE new.user_id IS NOT NULL AND new.user_id IS NOT old.user_id
+            ON CONFLICT (user_id) DO UPDATE SET version = version + 1;
+        END
+    """)
+    op.drop_table('book_changes')
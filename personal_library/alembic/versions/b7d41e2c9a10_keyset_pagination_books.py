@@ -0,0 +1,30 @@
+"""индекс для постраничной выборки книг
+
+Revision ID: b7d41e2c9a10
+Revises: 3a65a806c629
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d41e2c9a10'
+down_revision: Union[str, Sequence[str], None] = '3a65a806c629'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.create_index('ix_books_user_id_id', ['user_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.drop_index('ix_books_user_id_id')
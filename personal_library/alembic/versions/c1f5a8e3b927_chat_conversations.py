@@ -0,0 +1,67 @@
+"""сводка диалогов чата для администратора
+
+Revision ID: c1f5a8e3b927
+Revises: b9e4c7d2a613
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c1f5a8e3b927'
+down_revision: Union[str, Sequence[str], None] = 'b9e4c7d2a613'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('chat_conversations',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('last_message_id', sa.Integer(), nullable=False),
+    sa.Column('last_message', sa.Text(), nullable=False),
+    sa.Column('last_is_admin', sa.Integer(), nullable=False),
+    sa.Column('last_message_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('unread_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    with op.batch_alter_table('chat_conversations', schema=None) as batch_op:
+        batch_op.create_index('ix_chat_conversations_last_message_at_user_id', ['last_message_at', 'user_id'], unique=False)
+
+    # Однократное заполнение по существующей истории; непрочитанные — сообщения пользователя после последнего ответа администратора
+    op.execute("""
+        INSERT INTO chat_conversations (user_id, last_message_id, last_message, last_is_admin, last_message_at, unread_count)
+        SELECT m.user_id, m.id, m.message, COALESCE(m.is_admin, 0), m.created_at,
+            (SELECT count(*) FROM chat_messages u
+             WHERE u.user_id = m.user_id AND COALESCE(u.is_admin, 0) = 0
+               AND u.id > COALESCE((SELECT max(a.id) FROM chat_messages a WHERE a.user_id = m.user_id AND a.is_admin = 1), 0))
+        FROM chat_messages m
+        WHERE m.id = (SELECT max(l.id) FROM chat_messages l WHERE l.user_id = m.user_id)
+    """)
+    op.execute("""
+        CREATE TRIGGER chat_conversations_ai AFTER INSERT ON chat_messages
+        WHEN new.user_id IS NOT NULL BEGIN
+            INSERT INTO chat_conversations (user_id, last_message_id, last_message, last_is_admin, last_message_at, unread_count)
+            VALUES (new.user_id, new.id, new.message, COALESCE(new.is_admin, 0), new.created_at, CASE WHEN new.is_admin = 1 THEN 0 ELSE 1 END)
+            ON CONFLICT (user_id) DO UPDATE SET
+                last_message_id = excluded.last_message_id,
+                last_message = excluded.last_message,
+                last_is_admin = excluded.last_is_admin,
+                last_message_at = excluded.last_message_at,
+                unread_count = CASE WHEN excluded.last_is_admin = 1 THEN 0 ELSE unread_count + 1 END;
+        END
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS chat_conversations_ai")
+    with op.batch_alter_table('chat_conversations', schema=None) as batch_op:
+        batch_op.drop_index('ix_chat_conversations_last_message_at_user_id')
+
+    op.drop_table('chat_conversations')
@@ -0,0 +1,36 @@
+"""индексы для фильтрации и сортировки книг
+
+Revision ID: c52f8e1d7b34
+Revises: b7d41e2c9a10
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c52f8e1d7b34'
+down_revision: Union[str, Sequence[str], None] = 'b7d41e2c9a10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.create_index('ix_books_user_id_status', ['user_id', 'status'], unique=False)
+        batch_op.create_index('ix_books_user_id_genre', ['user_id', 'genre'], unique=False)
+        batch_op.create_index('ix_books_user_id_rating', ['user_id', 'rating'], unique=False)
+        batch_op.create_index('ix_books_user_id_end_date', ['user_id', 'end_date'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('books', schema=None) as batch_op:
+        batch_op.drop_index('ix_books_user_id_end_date')
+        batch_op.drop_index('ix_books_user_id_rating')
+        batch_op.drop_index('ix_books_user_id_genre')
+        batch_op.drop_index('ix_books_user_id_status')
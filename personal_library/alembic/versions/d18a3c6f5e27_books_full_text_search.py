@@ -0,0 +1,57 @@
+"""полнотекстовый поиск по книгам (FTS5)
+
+Revision ID: d18a3c6f5e27
+Revises: c52f8e1d7b34
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd18a3c6f5e27'
+down_revision: Union[str, Sequence[str], None] = 'c52f8e1d7b34'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("""
+        CREATE VIRTUAL TABLE books_fts USING fts5(
+            title, author, description, favorite_quotes,
+            content='books', content_rowid='id'
+        )
+    """)
+    op.execute("""
+        CREATE TRIGGER books_fts_ai AFTER INSERT ON books BEGIN
+            INSERT INTO books_fts(rowid, title, author, description, favorite_quotes)
+            VALUES (new.id, new.title, new.author, new.description, new.favorite_quotes);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER books_fts_ad AFTER DELETE ON books BEGIN
+            INSERT INTO books_fts(books_fts, rowid, title, author, description, favorite_quotes)
+            VALUES ('delete', old.id, old.title, old.author, old.description, old.favorite_quotes);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER books_fts_au AFTER UPDATE OF title, author, description, favorite_quotes ON books BEGIN
+            INSERT INTO books_fts(books_fts, rowid, title, author, description, favorite_quotes)
+            VALUES ('delete', old.id, old.title, old.author, old.description, old.favorite_quotes);
+            INSERT INTO books_fts(rowid, title, author, description, favorite_quotes)
+            VALUES (new.id, new.title, new.author, new.description, new.favorite_quotes);
+        END
+    """)
+    op.execute("INSERT INTO books_fts(books_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS books_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS books_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS books_fts_ai")
+    op.execute("DROP TABLE IF EXISTS books_fts")
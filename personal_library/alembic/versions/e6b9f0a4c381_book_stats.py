@@ -0,0 +1,82 @@
+"""счетчики статистики книг
+
+Revision ID: e6b9f0a4c381
+Revises: d18a3c6f5e27
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6b9f0a4c381'
+down_revision: Union[str, Sequence[str], None] = 'd18a3c6f5e27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('book_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=10), nullable=False),
+    sa.Column('key', sa.String(length=50), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('user_id', 'kind', 'key')
+    )
+    op.execute("""
+        CREATE TRIGGER book_stats_ai AFTER INSERT ON books BEGIN
+            INSERT INTO book_stats (user_id, kind, key, count) SELECT new.user_id, 'status', new.status, 1 WHERE 1 ON CONFLICT (user_id, kind, key) DO UPDATE SET count = count + 1;
+            INSERT INTO book_stats (user_id, kind, key, count) SELECT new.user_id, 'genre', new.genre, 1 WHERE 1 ON CONFLICT (user_id, kind, key) DO UPDATE SET count = count + 1;
+            INSERT INTO book_stats (user_id, kind, key, count) SELECT new.user_id, 'rating', CAST(new.rating AS TEXT), 1 WHERE new.rating IS NOT NULL ON CONFLICT (user_id, kind, key) DO UPDATE SET count = count + 1;
+            INSERT INTO book_stats (user_id, kind, key, count) SELECT new.user_id, 'month', substr(new.end_date, 1, 7), 1 WHERE new.status = 'READ' AND new.end_date IS NOT NULL ON CONFLICT (user_id, kind, key) DO UPDATE SET count = count + 1;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER book_stats_ad AFTER DELETE ON books BEGIN
+            UPDATE book_stats SET count = count - 1 WHERE user_id = old.user_id AND kind = 'status' AND key = old.status AND 1;
+            UPDATE book_stats SET count = count - 1 WHERE user_id = old.user_id AND kind = 'genre' AND key = old.genre AND 1;
+            UPDATE book_stats SET count = count - 1 WHERE user_id = old.user_id AND kind = 'rating' AND key = CAST(old.rating AS TEXT) AND old.rating IS NOT NULL;
+            UPDATE book_stats SET count = count - 1 WHERE user_id = old.user_id AND kind = 'month' AND key = substr(old.end_date, 1, 7) AND old.status = 'READ' AND old.end_date IS NOT NULL;
+            DELETE FROM book_stats WHERE user_id = old.user_id AND count <= 0;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER book_stats_au AFTER UPDATE OF status, genre, rating, end_date, user_id ON books BEGIN
+            UPDATE book_stats SET count = count - 1 WHERE user_id = old.user_id AND kind = 'status' AND key = old.status AND 1;
+            UPDATE book_stats SET count = count - 1 WHERE user_id = old.user_id AND kind = 'genre' AND key = old.genre AND 1;
+            UPDATE book_stats SET count = count - 1 WHERE user_id = old.user_id AND kind = 'rating' AND key = CAST(old.rating AS TEXT) AND old.rating IS NOT NULL;
+            UPDATE book_stats SET count = count - 1 WHERE user_id = old.user_id AND kind = 'month' AND key = substr(old.end_date, 1, 7) AND old.status = 'READ' AND old.end_date IS NOT NULL;
+            DELETE FROM book_stats WHERE user_id = old.user_id AND count <= 0;
+            INSERT INTO book_stats (user_id, kind, key, count) SELECT new.user_id, 'status', new.status, 1 WHERE 1 ON CONFLICT (user_id, kind, key) DO UPDATE SET count = count + 1;
+            INSERT INTO book_stats (user_id, kind, key, count) SELECT new.user_id, 'genre', new.genre, 1 WHERE 1 ON CONFLICT (user_id, kind, key) DO UPDATE SET count = count + 1;
+            INSERT INTO book_stats (user_id, kind, key, count) SELECT new.user_id, 'rating', CAST(new.rating AS TEXT), 1 WHERE new.rating IS NOT NULL ON CONFLICT (user_id, kind, key) DO UPDATE SET count = count + 1;
+            INSERT INTO book_stats (user_id, kind, key, count) SELECT new.user_id, 'month', substr(new.end_date, 1, 7), 1 WHERE new.status = 'READ' AND new.end_date IS NOT NULL ON CONFLICT (user_id, kind, key) DO UPDATE SET count = count + 1;
+        END
+    """)
+    op.execute("""
+        INSERT INTO book_stats (user_id, kind, key, count)
+        SELECT * FROM (
+            SELECT user_id, 'status', status, COUNT(*) FROM books GROUP BY user_id, status
+            UNION ALL
+            SELECT user_id, 'genre', genre, COUNT(*) FROM books GROUP BY user_id, genre
+            UNION ALL
+            SELECT user_id, 'rating', CAST(rating AS TEXT), COUNT(*) FROM books
+            WHERE rating IS NOT NULL GROUP BY user_id, rating
+            UNION ALL
+            SELECT user_id, 'month', substr(end_date, 1, 7), COUNT(*) FROM books
+            WHERE status = 'READ' AND end_date IS NOT NULL GROUP BY user_id, substr(end_date, 1, 7)
+        )
+        WHERE NOT EXISTS (SELECT 1 FROM book_stats)
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS book_stats_au")
+    op.execute("DROP TRIGGER IF EXISTS book_stats_ad")
+    op.execute("DROP TRIGGER IF EXISTS book_stats_ai")
+    op.drop_table('book_stats')
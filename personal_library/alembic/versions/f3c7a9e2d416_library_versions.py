@@ -0,0 +1,57 @@
+"""версии библиотек пользователей для ETag
+
+Revision ID: f3c7a9e2d416
+Revises: e6b9f0a4c381
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c7a9e2d416'
+down_revision: Union[str, Sequence[str], None] = 'e6b9f0a4c381'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('library_versions',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.execute("""
+        CREATE TRIGGER library_versions_ai AFTER INSERT ON books BEGIN
+            INSERT INTO library_versions (user_id, version) SELECT new.user_id, 1 WHERE new.user_id IS NOT NULL ON CONFLICT (user_id) DO UPDATE SET version = version + 1;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER library_versions_ad AFTER DELETE ON books BEGIN
+            INSERT INTO library_versions (user_id, version) SELECT old.user_id, 1 WHERE old.user_id IS NOT NULL ON CONFLICT (user_id) DO UPDATE SET version = version + 1;
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER library_versions_au AFTER UPDATE ON books BEGIN
+            INSERT INTO library_versions (user_id, version) SELECT old.user_id, 1 WHERE old.user_id IS NOT NULL ON CONFLICT (user_id) DO UPDATE SET version = version + 1;
+            INSERT INTO library_versions (user_id, version) SELECT new.user_id, 1
+            WHERE new.user_id IS NOT NULL AND new.user_id IS NOT old.user_id
+            ON CONFLICT (user_id) DO UPDATE SET version = version + 1;
+        END
+    """)
+    op.execute("""
+        INSERT INTO library_versions (user_id, version)
+        SELECT user_id, 1 FROM books WHERE user_id IS NOT NULL GROUP BY user_id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS library_versions_au")
+    op.execute("DROP TRIGGER IF EXISTS library_versions_ad")
+    op.execute("DROP TRIGGER IF EXISTS library_versions_ai")
+    op.drop_table('library_versions')
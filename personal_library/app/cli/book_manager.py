@@ -11,6 +11,7 @@ from sqlalchemy.orm import sessionmaker
 
 from app.database import SessionLocal
 from app.models.book import Book, BookStatus
+from app.models.book_change import BOOK_CHANGES_RETENTION
 from app.models.user import User
 from app.repositories.book_repository import BookRepository
 from app.schemas.book import BookCreate, BookUpdate
@@ -411,5 +412,16 @@ def delete(book_id: int, user_id: int = typer.Option(..., prompt="User ID")):
     else:
         console.print(f"[red]❌ Ошибка при удалении книги с ID {book_id}[/red]")
 
+@app.command()
+def compact_changes(keep: int = typer.Option(BOOK_CHANGES_RETENTION, min=0, help="Сколько последних изменений хранить на пользователя")):
+    db = next(get_session())
+    repository = BookRepository(db)
+
+    try:
+        removed = repository.compact_changes(keep)
+        console.print(f"[green]✅ Журнал изменений сжат, удалено записей: {removed}[/green]")
+    except Exception as e:
+        console.print(f"[red]❌ Ошибка при сжатии журнала изменений: {e}[/red]")
+
 if __name__ == "__main__":
     app()
@@ -1,27 +1,40 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from app.models.user import User
 from app.schemas.user import UserCreate, UserLogin, Token, UserResponse, RefreshTokenRequest
-from app.utils.jwt import create_access_token, create_refresh_token, refresh_tokens
+from app.utils.jwt import create_access_token, create_refresh_token, refresh_tokens, verify_token
+from app.services.password_hasher import password_hasher, HasherBusyError, AUTH_RETRY_AFTER_SECONDS
 from datetime import timedelta
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+def hasher_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Сервер перегружен, повторите попытку позже",
+        headers={"Retry-After": str(AUTH_RETRY_AFTER_SECONDS)}
+    )
+
 @router.post("/register", response_model=Token)
-def register(user_data: UserCreate, db: Session = Depends(get_db)):
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
+    existing_user = await db.scalar(select(User).where(User.email == user_data.email))
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Пользователь с таким email уже существует"
         )
     
-    hashed_password = User.get_password_hash(user_data.password)
+    # bcrypt нагружает CPU, поэтому выполняется в пуле процессов
+    try:
+        hashed_password = await password_hasher.hash(user_data.password)
+    except HasherBusyError:
+        raise hasher_busy()
     db_user = User(email=user_data.email, hashed_password=hashed_password)
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     token_data = {"user_id": db_user.id, "email": db_user.email, "role": db_user.role}
     access_token = create_access_token(token_data)
@@ -35,13 +48,29 @@ def register(user_data: UserCreate, db: Session = Depends(get_db)):
     )
 
 @router.post("/login", response_model=Token)
-def login(user_data: UserLogin, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == user_data.email).first()
-    if not user or not User.verify_password(user_data.password, user.hashed_password):
+async def login(user_data: UserLogin, db: AsyncSession = Depends(get_async_db)):
+    user = await db.scalar(select(User).where(User.email == user_data.email))
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Неверный email или пароль"
+        )
+
+    try:
+        valid, new_hash = await password_hasher.verify(user_data.password, user.hashed_password)
+    except HasherBusyError:
+        raise hasher_busy()
+
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Неверный email или пароль"
         )
+
+    # Стоимость bcrypt изменилась: сохраняем хэш, пересчитанный с текущими настройками
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
     
     token_data = {"user_id": user.id, "email": user.email, "role": user.role}
     access_token = create_access_token(token_data)
@@ -55,23 +84,17 @@ def login(user_data: UserLogin, db: Session = Depends(get_db)):
     )
 
 @router.post("/refresh", response_model=Token)
-def refresh_token(request: RefreshTokenRequest, db: Session = Depends(get_db)):
-    tokens = refresh_tokens(request.refresh_token)
-    if not tokens:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Неверный refresh token"
-        )
-    
-    from app.utils.jwt import verify_token
+async def refresh_token(request: RefreshTokenRequest, db: AsyncSession = Depends(get_async_db)):
+    # Токен декодируется один раз, claims используются и для выпуска новой пары, и для поиска пользователя
     payload = verify_token(request.refresh_token)
-    if not payload:
+    tokens = refresh_tokens(payload)
+    if not tokens:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Неверный refresh token"
         )
     
-    user = db.query(User).filter(User.id == payload.get("user_id")).first()
+    user = await db.scalar(select(User).where(User.id == payload.get("user_id")))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
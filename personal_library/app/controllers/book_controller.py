@@ -1,27 +1,53 @@
-from fastapi import APIRouter, Depends, HTTPException, status as http_status, Form
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status as http_status, Form, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from datetime import date
 import logging
+import time
 
-from app.database import get_db
-from app.schemas.book import BookCreate, BookUpdate, BookResponse
-from app.services.book_service import BookService
+from app.database import get_async_db, AsyncSessionLocal
+from app.schemas.book import BOOK_RESPONSE_FIELDS, BookCreate, BookUpdate, BookResponse, BookPage, BookQuery, BookImportError, BookImportResult, BookStatsResponse, BookChangesResponse, BookBatchUpdate, BookBatchResult, book_page_adapter, book_changes_adapter, book_response_adapter
+from app.services.book_service import AsyncBookService
+from app.services.websocket_server import chat_server
 from app.dependencies import get_current_user  
+from app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.utils.serialization import json_response
+from app.utils.fields import parse_fields
+from app.utils.etag import make_etag, etag_matches, not_modified, cache_headers
+from app.utils.bulk_import import BULK_CHUNK_SIZE, MAX_REPORTED_ERRORS, CSV, detect_format, iter_records
 
 router = APIRouter(prefix="/books", tags=["books"])
 logger = logging.getLogger(__name__)
 
-@router.get("/", response_model=List[BookResponse])
-def get_books(
-    db: Session = Depends(get_db),
+@router.get("/", response_model=BookPage)
+async def get_books(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    params: BookQuery = Depends(),
+    fields: Optional[str] = Query(None, description="Список полей через запятую, например title,author,status"),
+    db: AsyncSession = Depends(get_async_db),
     user_data: dict = Depends(get_current_user)  
 ):
     try:
-        service = BookService(db)
+        service = AsyncBookService(db)
         user_id = user_data.get('user_id')
-        books = service.get_books_by_user(user_id)
-        return books
+        selected = parse_fields(fields, BOOK_RESPONSE_FIELDS)
+
+        version = await service.get_library_version(user_id)
+        etag = make_etag(user_id, version, request.url.query)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+        page = await service.get_books_page(user_id, limit, cursor, params, selected, version)
+        include = {"items": {"__all__": set(selected)}, "next_cursor": True} if selected else None
+        return json_response(book_page_adapter, page, headers=cache_headers(etag), include=include)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         logger.error(f"Ошибка при получении списка книг: {str(e)}")
         raise HTTPException(
@@ -29,14 +55,96 @@ def get_books(
             detail="Внутренняя ошибка сервера"
         )
 
+@router.get("/stats", response_model=BookStatsResponse)
+async def get_book_stats(
+    db: AsyncSession = Depends(get_async_db),
+    user_data: dict = Depends(get_current_user)
+):
+    service = AsyncBookService(db)
+    return await service.get_stats(user_data.get('user_id'))
+
+@router.get("/changes", response_model=BookChangesResponse)
+async def get_book_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_db),
+    user_data: dict = Depends(get_current_user)
+):
+    service = AsyncBookService(db)
+    changes = await service.get_changes(user_data.get('user_id'), since, limit)
+    return json_response(book_changes_adapter, changes)
+
+@router.get("/search", response_model=BookPage)
+async def search_books(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    user_data: dict = Depends(get_current_user)
+):
+    """
+    Полнотекстовый поиск по книгам пользователя, от более релевантных к менее.
+    Курсор страниц работает по принципу best effort: оценка bm25 зависит от статистики всего
+    индекса, включая книги других пользователей, поэтому любая запись между запросами страниц
+    сдвигает оценки, и следующая страница может пропустить или повторить результаты.
+    Для полного обхода без пропусков используйте GET /books/ с фильтрами
+    """
+    try:
+        service = AsyncBookService(db)
+        page = await service.search_books(user_data.get('user_id'), q, limit, cursor)
+        return json_response(book_page_adapter, page)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=http_status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except Exception as e:
+        logger.error(f"Ошибка при поиске книг: {str(e)}")
+        raise HTTPException(
+            status_code=http_status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Внутренняя ошибка сервера"
+        )
+
+@router.get("/export")
+async def export_books(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    user_data: dict = Depends(get_current_user)
+):
+    user_id = user_data.get('user_id')
+
+    # Сессия живет столько же, сколько поток ответа, а не зависимость запроса
+    async def stream():
+        async with AsyncSessionLocal() as db:
+            try:
+                async for chunk in AsyncBookService(db).export_books(user_id, format):
+                    yield chunk
+            except Exception as e:
+                logger.error(f"Ошибка при экспорте книг: {str(e)}")
+                raise
+
+    media_type = "text/csv" if format == CSV else "application/x-ndjson"
+    return StreamingResponse(
+        stream(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="books.{format}"'}
+    )
+
 @router.get("/{book_id}", response_model=BookResponse)
-def get_book(
+async def get_book(
     book_id: int, 
-    db: Session = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
     user_data: dict = Depends(get_current_user)  
 ):
-    service = BookService(db)
-    book = service.get_book_by_id(book_id)
+    service = AsyncBookService(db)
+    user_id = user_data.get('user_id')
+
+    version = await service.get_library_version(user_id)
+    etag = make_etag(user_id, version, book_id)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    book = await service.get_book_by_id(book_id, user_id, version)
     
     if not book:
         raise HTTPException(
@@ -45,16 +153,16 @@ def get_book(
         )
     
     
-    if book.user_id != user_data.get('user_id'):
+    if book.user_id != user_id:
         raise HTTPException(
             status_code=http_status.HTTP_403_FORBIDDEN,
             detail="Доступ запрещен"
         )
     
-    return book
+    return json_response(book_response_adapter, book, headers=cache_headers(etag))
 
 @router.post("/", response_model=BookResponse, status_code=http_status.HTTP_201_CREATED)
-def create_book(
+async def create_book(
     title: str = Form(...),
     author: str = Form(...),
     genre: str = Form(...),
@@ -64,7 +172,7 @@ def create_book(
     start_date: Optional[date] = Form(None),
     end_date: Optional[date] = Form(None),
     book_status: str = Form("PLANNED"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user_data: dict = Depends(get_current_user) 
 ):
     try:
@@ -97,8 +205,10 @@ def create_book(
             status=book_status
         )
         
-        service = BookService(db)
-        return service.create_book(book_data, user_data.get('user_id'))
+        service = AsyncBookService(db)
+        book = await service.create_book(book_data, user_data.get('user_id'))
+        chat_server.publish_library_event(user_data.get('user_id'), "created", [book.id])
+        return book
     
     except HTTPException:
         raise
@@ -109,15 +219,87 @@ def create_book(
             detail="Внутренняя ошибка сервера при создании книги"
         )
 
+@router.post("/bulk", response_model=BookImportResult)
+async def bulk_create_books(
+    request: Request,
+    format: Optional[str] = Query(None, pattern="^(ndjson|csv)$"),
+    db: AsyncSession = Depends(get_async_db),
+    user_data: dict = Depends(get_current_user)
+):
+    service = AsyncBookService(db)
+    user_id = user_data.get('user_id')
+    fmt = format or detect_format(request.headers.get("content-type"))
+    result = BookImportResult()
+    started = time.perf_counter()
+
+    def add_errors(errors: List[BookImportError]):
+        result.failed += len(errors)
+        room = MAX_REPORTED_ERRORS - len(result.errors)
+        if room > 0:
+            result.errors.extend(errors[:room])
+
+    async def flush(chunk):
+        inserted, errors = await service.import_books(chunk, user_id)
+        result.inserted += inserted
+        add_errors(errors)
+
+    try:
+        chunk = []
+        async for line, record, error in iter_records(request.stream(), fmt):
+            if error:
+                add_errors([BookImportError(line=line, error=error)])
+                continue
+            chunk.append((line, record))
+            if len(chunk) >= BULK_CHUNK_SIZE:
+                await flush(chunk)
+                chunk = []
+        if chunk:
+            await flush(chunk)
+    except Exception as e:
+        logger.error(f"Ошибка при массовом импорте книг: {str(e)}")
+        raise HTTPException(
+            status_code=http_status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Внутренняя ошибка сервера при импорте, добавлено книг: {result.inserted}"
+        )
+
+    result.errors.sort(key=lambda err: err.line)
+    if result.inserted:
+        chat_server.publish_library_event(user_id, "imported", count=result.inserted)
+    result.elapsed_seconds = round(time.perf_counter() - started, 3)
+    if result.elapsed_seconds > 0:
+        result.rows_per_second = round(result.inserted / result.elapsed_seconds, 1)
+    return result
+
+@router.patch("/batch", response_model=BookBatchResult)
+async def batch_update_books(
+    batch: BookBatchUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    user_data: dict = Depends(get_current_user)
+):
+    try:
+        service = AsyncBookService(db)
+        result = await service.batch_update_books(batch, user_data.get('user_id'))
+        if result.updated:
+            chat_server.publish_library_event(
+                user_data.get('user_id'), "updated", [item.id for item in result.results if item.ok]
+            )
+        return result
+    except Exception as e:
+        logger.error(f"Ошибка при пакетном изменении книг: {str(e)}")
+        raise HTTPException(
+            status_code=http_status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Внутренняя ошибка сервера при пакетном изменении книг"
+        )
+
 @router.patch("/{book_id}", response_model=BookResponse)
-def update_book(
+async def update_book(
     book_id: int, 
     book_update: BookUpdate, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user_data: dict = Depends(get_current_user)  
 ):
-    service = BookService(db)
-    book = service.update_book(book_id, book_update, user_data.get('user_id'))
+    service = AsyncBookService(db)
+    book = await service.update_book(book_id, book_update, user_data.get('user_id'))
     
     if not book:
         raise HTTPException(
@@ -125,17 +307,18 @@ def update_book(
             detail="Книга не найдена или у вас нет прав для ее редактирования"
         )
     
+    chat_server.publish_library_event(user_data.get('user_id'), "updated", [book_id])
     return book
 
 @router.put("/{book_id}", response_model=BookResponse)
-def update_book_full(
+async def update_book_full(
     book_id: int, 
     book_update: BookUpdate, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user_data: dict = Depends(get_current_user)  
 ):
-    service = BookService(db)
-    book = service.update_book(book_id, book_update, user_data.get('user_id'))
+    service = AsyncBookService(db)
+    book = await service.update_book(book_id, book_update, user_data.get('user_id'))
     
     if not book:
         raise HTTPException(
@@ -143,19 +326,21 @@ def update_book_full(
             detail="Книга не найдена или у вас нет прав для ее редактирования"
         )
     
+    chat_server.publish_library_event(user_data.get('user_id'), "updated", [book_id])
     return book
 
 @router.delete("/{book_id}")
-def delete_book(
+async def delete_book(
     book_id: int, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user_data: dict = Depends(get_current_user)  
 ):
-    service = BookService(db)
-    if not service.delete_book(book_id, user_data.get('user_id')):
+    service = AsyncBookService(db)
+    if not await service.delete_book(book_id, user_data.get('user_id')):
         raise HTTPException(
             status_code=http_status.HTTP_404_NOT_FOUND,
             detail="Книга не найдена или у вас нет прав для ее удаления"
         )
     
+    chat_server.publish_library_event(user_data.get('user_id'), "deleted", [book_id])
     return {"message": "Книга успешно удалена"}
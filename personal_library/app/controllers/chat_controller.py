@@ -1,33 +1,77 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from app.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from app.models.chat import ChatMessage
-from app.schemas.chat import ChatMessageCreate, ChatMessageResponse
+from app.schemas.chat import (
+    CHAT_MESSAGE_FIELDS, ChatConversationPage, ChatMessageCreate, ChatMessagePage, ChatMessageResponse,
+    chat_conversation_page_adapter, chat_message_page_adapter
+)
 from app.dependencies import get_current_user  
-from typing import List
+from app.services.chat_service import AsyncChatService
+from app.utils.fields import parse_fields
+from app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.utils.serialization import json_response
+from typing import Optional
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
-@router.get("/messages", response_model=List[ChatMessageResponse])
-def get_chat_messages(
-    db: Session = Depends(get_db),
+def require_admin(user_data: dict) -> None:
+    if user_data.get('role') != 'admin':
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Требуются права администратора")
+
+@router.get("/messages", response_model=ChatMessagePage)
+async def get_chat_messages(
+    db: AsyncSession = Depends(get_async_db),
     user_data: dict = Depends(get_current_user),  
-    skip: int = 0,
-    limit: int = 50
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[str] = Query(None, description="next_cursor предыдущей страницы: сообщения старше него"),
+    fields: Optional[str] = Query(None, description="Список полей через запятую, например id,message")
 ):
-    if user_data.get('role') == 'admin':
-        messages = db.query(ChatMessage).offset(skip).limit(limit).all()
-    else:
-        messages = db.query(ChatMessage).filter(
-            ChatMessage.user_id == user_data.get('user_id')
-        ).offset(skip).limit(limit).all()
-    
-    return messages
+    try:
+        selected = parse_fields(fields, CHAT_MESSAGE_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    # Администратор видит общую историю, пользователь — только свою
+    user_id = None if user_data.get('role') == 'admin' else user_data.get('user_id')
+    service = AsyncChatService(db)
+    try:
+        page = await service.get_history(user_id, limit, before, selected)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    include = {"items": {"__all__": set(selected)}, "next_cursor": True} if selected else None
+    return json_response(chat_message_page_adapter, page, include=include)
+
+@router.get("/conversations", response_model=ChatConversationPage)
+async def get_chat_conversations(
+    db: AsyncSession = Depends(get_async_db),
+    user_data: dict = Depends(get_current_user),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    before: Optional[str] = Query(None, description="next_cursor предыдущей страницы")
+):
+    require_admin(user_data)
+    try:
+        page = await AsyncChatService(db).get_conversations(limit, before)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return json_response(chat_conversation_page_adapter, page)
+
+@router.post("/conversations/{user_id}/read")
+async def mark_chat_conversation_read(
+    user_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    user_data: dict = Depends(get_current_user)
+):
+    require_admin(user_data)
+    if not await AsyncChatService(db).mark_conversation_read(user_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Диалог не найден")
+    return {"message": "Диалог отмечен как прочитанный"}
 
 @router.post("/messages", response_model=ChatMessageResponse)
-def create_chat_message(
+async def create_chat_message(
     message_data: ChatMessageCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user_data: dict = Depends(get_current_user)  
 ):
     db_message = ChatMessage(
@@ -37,7 +81,7 @@ def create_chat_message(
     )
     
     db.add(db_message)
-    db.commit()
-    db.refresh(db_message)
+    await db.commit()
+    await db.refresh(db_message)
     
     return db_message
\ No newline at end of file
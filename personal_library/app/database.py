@@ -1,8 +1,17 @@
-from sqlalchemy import create_engine
+import os
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, inspect
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./library.db"
+# Путь к файлу базы: движки привязываются к нему при импорте модуля
+LIBRARY_DB_PATH = os.getenv("LIBRARY_DB_PATH", "./library.db")
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{LIBRARY_DB_PATH}"
+SQLALCHEMY_ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{LIBRARY_DB_PATH}"
+
+ALEMBIC_SCRIPT_LOCATION = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic")
 
 Base = declarative_base()
 
@@ -12,6 +21,12 @@ engine = create_engine(
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = create_async_engine(SQLALCHEMY_ASYNC_DATABASE_URL)
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 def get_db():
     db = SessionLocal()
     try:
@@ -19,5 +34,26 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def alembic_config() -> Config:
+    # Без alembic.ini: иначе env.py перенастроит логирование приложения через fileConfig
+    config = Config()
+    config.set_main_option("script_location", ALEMBIC_SCRIPT_LOCATION)
+    config.set_main_option("sqlalchemy.url", SQLALCHEMY_DATABASE_URL)
+    return config
+
 def create_tables():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    """
+    База под управлением alembic обновляется миграциями: create_all не добавляет индексы к существующим
+    таблицам и не переносит данные, а созданные им таблицы ломают последующий alembic upgrade.
+    Новая база создается по моделям и сразу помечается последней ревизией
+    """
+    config = alembic_config()
+    if inspect(engine).has_table("alembic_version"):
+        command.upgrade(config, "head")
+    else:
+        Base.metadata.create_all(bind=engine)
+        command.stamp(config, "head")
@@ -1,16 +1,16 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.openapi.utils import get_openapi
 import logging
-import asyncio
-import threading
-import websockets
 
 from app.controllers.book_controller import router as book_router
 from app.controllers.auth_controller import router as auth_router
 from app.controllers.chat_controller import router as chat_router
-from app.database import create_tables
-from app.services.websocket_server import websocket_handler  
+from app.database import create_tables, async_engine
+from app.services.websocket_server import websocket_handler, chat_server
+from app.services.cache import book_cache
+from app.utils.jwt import token_cache
+from app.services.password_hasher import password_hasher
 from app.models import book, user, chat
 
 logging.basicConfig(
@@ -66,57 +66,26 @@ def custom_openapi():
 
 app.openapi = custom_openapi
 
-async def run_websocket_server():
-    try:
-        ports = [8080, 8081, 8082, 8083]
-        for port in ports:
-            try:
-                server = await websockets.serve(
-                    websocket_handler, 
-                    "localhost", 
-                    port
-                )
-                print(f"✅ WebSocket Chat Server запущен на ws://localhost:{port}")
-                print(f"📝 Протокол: WebSocket")
-                print(f"🎯 Назначение: Чат технической поддержки")
-                print(f"👥 Участники: Пользователи ↔ Администраторы")
-                
-                await asyncio.Future()
-                return
-                
-            except OSError as e:
-                if "10048" in str(e) or "Address already in use" in str(e):
-                    print(f"⚠️  Порт {port} занят, пробуем следующий...")
-                    continue
-                else:
-                    raise e
-        
-        print("❌ Все порты заняты! WebSocket сервер не запущен.")
-        
-    except Exception as e:
-        print(f"❌ Не удалось запустить WebSocket сервер: {e}")
-
-def start_websocket_server():
-    try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        loop.run_until_complete(run_websocket_server())
-    except Exception as e:
-        print(f"❌ Ошибка в WebSocket сервере: {e}")
-
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
     create_tables()
     print("✅ База данных инициализирована")
-    
-    websocket_thread = threading.Thread(target=start_websocket_server, daemon=True)
-    websocket_thread.start()
-    print("🔄 Запуск WebSocket сервера в фоновом режиме...")
+    await chat_server.start()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await chat_server.stop()
+    password_hasher.shutdown()
+    await async_engine.dispose()
 
 app.include_router(book_router)
 app.include_router(auth_router)
 app.include_router(chat_router)
 
+@app.websocket("/ws")
+async def chat_websocket(websocket: WebSocket):
+    await websocket_handler(websocket)
+
 @app.get("/")
 def read_root():
     return {"message": "Добро пожаловать в личную библиотеку!"}
@@ -125,11 +94,15 @@ def read_root():
 def health_check():
     return {"status": "healthy", "service": "personal-library-api"}
 
+@app.get("/metrics")
+def metrics():
+    return {"book_cache": book_cache.stats(), "jwt": token_cache.stats(), "password_hasher": password_hasher.stats(), "chat": chat_server.stats()}
+
 @app.get("/websocket-info")
 def websocket_info():
     """Информация о WebSocket соединении"""
     return {
-        "websocket_url": "ws://localhost:8080",
+        "websocket_url": "ws://localhost:8000/ws",
         "protocol": "WebSocket",
         "purpose": "Чат технической поддержки",
         "features": [
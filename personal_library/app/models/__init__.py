@@ -1,5 +1,9 @@
 from app.models.book import Book, BookStatus
+from app.models.book_stats import BookStat
+from app.models.book_change import BookChange
+from app.models.library_version import LibraryVersion
 from app.models.user import User
 from app.models.chat import ChatMessage
+from app.models.chat_conversation import ChatConversation
 
-__all__ = ["Book", "BookStatus", "User", "ChatMessage"]
\ No newline at end of file
+__all__ = ["Book", "BookStatus", "BookStat", "BookChange", "LibraryVersion", "User", "ChatMessage", "ChatConversation"]
\ No newline at end of file
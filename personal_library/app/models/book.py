@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Enum, Date, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Enum, Date, ForeignKey, Index, DDL, event
 from sqlalchemy.orm import relationship
 import enum
 from app.database import Base
@@ -10,6 +10,13 @@ class BookStatus(enum.Enum):
 
 class Book(Base):
     __tablename__ = "books"
+    __table_args__ = (
+        Index("ix_books_user_id_id", "user_id", "id"),
+        Index("ix_books_user_id_status", "user_id", "status"),
+        Index("ix_books_user_id_genre", "user_id", "genre"),
+        Index("ix_books_user_id_rating", "user_id", "rating"),
+        Index("ix_books_user_id_end_date", "user_id", "end_date"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String(200), nullable=False)
@@ -23,4 +30,45 @@ class Book(Base):
     status = Column(Enum(BookStatus), default=BookStatus.PLANNED)
     user_id = Column(Integer, ForeignKey("users.id"))
     
-    user = relationship("User")
\ No newline at end of file
+    user = relationship("User")
+
+# Полнотекстовый индекс FTS5 поверх books (external content), синхронизируется триггерами
+BOOKS_FTS_TABLE = "books_fts"
+
+BOOKS_FTS_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+        title, author, description, favorite_quotes,
+        content='books', content_rowid='id'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN
+        INSERT INTO books_fts(rowid, title, author, description, favorite_quotes)
+        VALUES (new.id, new.title, new.author, new.description, new.favorite_quotes);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, author, description, favorite_quotes)
+        VALUES ('delete', old.id, old.title, old.author, old.description, old.favorite_quotes);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_au AFTER UPDATE OF title, author, description, favorite_quotes ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, author, description, favorite_quotes)
+        VALUES ('delete', old.id, old.title, old.author, old.description, old.favorite_quotes);
+        INSERT INTO books_fts(rowid, title, author, description, favorite_quotes)
+        VALUES (new.id, new.title, new.author, new.description, new.favorite_quotes);
+    END
+    """,
+    # Индекс по уже существующим книгам строится один раз, пока он пуст
+    """
+    INSERT INTO books_fts(books_fts) SELECT 'rebuild'
+    WHERE NOT EXISTS (SELECT 1 FROM books_fts_docsize) AND EXISTS (SELECT 1 FROM books)
+    """,
+]
+
+# На уровне метаданных, как остальные триггеры: create_all выполняет их и при уже существующей таблице books
+for statement in BOOKS_FTS_DDL:
+    event.listen(Base.metadata, "after_create", DDL(statement).execute_if(dialect="sqlite"))
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, String
+from app.database import Base
+
+class BookChange(Base):
+    """
+    Журнал изменений книг для инкрементальной синхронизации клиентов.
+    seq совпадает с версией библиотеки: запись добавляется теми же триггерами, что увеличивают library_versions
+    """
+    __tablename__ = "book_changes"
+
+    user_id = Column(Integer, primary_key=True)
+    seq = Column(Integer, primary_key=True, autoincrement=False)
+    book_id = Column(Integer, nullable=False)
+    op = Column(String(10), nullable=False)
+
+CHANGE_UPSERT = "upsert"
+CHANGE_DELETE = "delete"
+
+# Сколько последних изменений на пользователя оставляет сжатие журнала
+BOOK_CHANGES_RETENTION = 10000
@@ -0,0 +1,82 @@
+from sqlalchemy import Column, Integer, String, DDL, event
+from app.database import Base
+
+class BookStat(Base):
+    """Счетчики по книгам пользователя, поддерживаются триггерами на books"""
+    __tablename__ = "book_stats"
+
+    user_id = Column(Integer, primary_key=True)
+    kind = Column(String(10), primary_key=True)
+    key = Column(String(50), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+STAT_STATUS = "status"
+STAT_GENRE = "genre"
+STAT_RATING = "rating"
+STAT_MONTH = "month"
+
+def _stat_keys(ref: str):
+    # (вид счетчика, выражение ключа, условие учета книги)
+    return [
+        (STAT_STATUS, f"{ref}.status", "1"),
+        (STAT_GENRE, f"{ref}.genre", "1"),
+        (STAT_RATING, f"CAST({ref}.rating AS TEXT)", f"{ref}.rating IS NOT NULL"),
+        (STAT_MONTH, f"substr({ref}.end_date, 1, 7)", f"{ref}.status = 'READ' AND {ref}.end_date IS NOT NULL"),
+    ]
+
+def _increment(ref: str) -> str:
+    return "\n".join(
+        f"INSERT INTO book_stats (user_id, kind, key, count) "
+        f"SELECT {ref}.user_id, '{kind}', {key}, 1 WHERE {cond} "
+        f"ON CONFLICT (user_id, kind, key) DO UPDATE SET count = count + 1;"
+        for kind, key, cond in _stat_keys(ref)
+    )
+
+def _decrement(ref: str) -> str:
+    statements = [
+        f"UPDATE book_stats SET count = count - 1 "
+        f"WHERE user_id = {ref}.user_id AND kind = '{kind}' AND key = {key} AND {cond};"
+        for kind, key, cond in _stat_keys(ref)
+    ]
+    statements.append(f"DELETE FROM book_stats WHERE user_id = {ref}.user_id AND count <= 0;")
+    return "\n".join(statements)
+
+BOOK_STATS_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS book_stats_ai AFTER INSERT ON books BEGIN
+        {_increment("new")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS book_stats_ad AFTER DELETE ON books BEGIN
+        {_decrement("old")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS book_stats_au AFTER UPDATE OF status, genre, rating, end_date, user_id ON books BEGIN
+        {_decrement("old")}
+        {_increment("new")}
+    END
+    """,
+]
+
+# Заполнение счетчиков по уже существующим книгам, если таблица пуста
+BOOK_STATS_BACKFILL = """
+    INSERT INTO book_stats (user_id, kind, key, count)
+    SELECT * FROM (
+        SELECT user_id, 'status', status, COUNT(*) FROM books GROUP BY user_id, status
+        UNION ALL
+        SELECT user_id, 'genre', genre, COUNT(*) FROM books GROUP BY user_id, genre
+        UNION ALL
+        SELECT user_id, 'rating', CAST(rating AS TEXT), COUNT(*) FROM books
+        WHERE rating IS NOT NULL GROUP BY user_id, rating
+        UNION ALL
+        SELECT user_id, 'month', substr(end_date, 1, 7), COUNT(*) FROM books
+        WHERE status = 'READ' AND end_date IS NOT NULL GROUP BY user_id, substr(end_date, 1, 7)
+    )
+    WHERE NOT EXISTS (SELECT 1 FROM book_stats)
+"""
+
+# Триггеры ссылаются на books, поэтому создаются после всех таблиц
+for statement in BOOK_STATS_TRIGGERS + [BOOK_STATS_BACKFILL]:
+    event.listen(Base.metadata, "after_create", DDL(statement).execute_if(dialect="sqlite"))
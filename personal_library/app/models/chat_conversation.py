@@ -0,0 +1,42 @@
+from sqlalchemy import Column, Integer, DateTime, Text, ForeignKey, Index, DDL, event
+from sqlalchemy.orm import relationship
+from app.database import Base
+
+class ChatConversation(Base):
+    """
+    Сводка переписки пользователя для списка диалогов администратора: последнее сообщение и число непрочитанных.
+    Обновляется триггером при каждой вставке в chat_messages, в той же транзакции
+    """
+    __tablename__ = "chat_conversations"
+    __table_args__ = (
+        Index("ix_chat_conversations_last_message_at_user_id", "last_message_at", "user_id"),
+    )
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    last_message_id = Column(Integer, nullable=False)
+    last_message = Column(Text, nullable=False)
+    last_is_admin = Column(Integer, nullable=False, default=0)
+    last_message_at = Column(DateTime(timezone=True))
+    # Сообщения пользователя после последнего ответа администратора или отметки о прочтении
+    unread_count = Column(Integer, nullable=False, default=0)
+
+    user = relationship("User")
+
+CHAT_CONVERSATION_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS chat_conversations_ai AFTER INSERT ON chat_messages
+    WHEN new.user_id IS NOT NULL BEGIN
+        INSERT INTO chat_conversations (user_id, last_message_id, last_message, last_is_admin, last_message_at, unread_count)
+        VALUES (new.user_id, new.id, new.message, COALESCE(new.is_admin, 0), new.created_at, CASE WHEN new.is_admin = 1 THEN 0 ELSE 1 END)
+        ON CONFLICT (user_id) DO UPDATE SET
+            last_message_id = excluded.last_message_id,
+            last_message = excluded.last_message,
+            last_is_admin = excluded.last_is_admin,
+            last_message_at = excluded.last_message_at,
+            unread_count = CASE WHEN excluded.last_is_admin = 1 THEN 0 ELSE unread_count + 1 END;
+    END
+    """,
+]
+
+for statement in CHAT_CONVERSATION_TRIGGERS:
+    event.listen(Base.metadata, "after_create", DDL(statement).execute_if(dialect="sqlite"))
@@ -0,0 +1,52 @@
+from sqlalchemy import Column, Integer, DDL, event
+from app.database import Base
+from app.models.book_change import CHANGE_UPSERT, CHANGE_DELETE
+
+class LibraryVersion(Base):
+    """Версия библиотеки пользователя, увеличивается триггерами при любой записи в books"""
+    __tablename__ = "library_versions"
+
+    user_id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+def _bump(ref: str) -> str:
+    return (
+        f"INSERT INTO library_versions (user_id, version) SELECT {ref}.user_id, 1 WHERE {ref}.user_id IS NOT NULL "
+        f"ON CONFLICT (user_id) DO UPDATE SET version = version + 1;"
+    )
+
+def _log(ref: str, op: str, cond: str = "") -> str:
+    # Запись в журнал получает только что увеличенную версию как порядковый номер
+    return (
+        f"INSERT INTO book_changes (user_id, seq, book_id, op) "
+        f"SELECT user_id, version, {ref}.id, {op} FROM library_versions "
+        f"WHERE user_id = {ref}.user_id{f' AND {cond}' if cond else ''};"
+    )
+
+LIBRARY_VERSION_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS library_versions_ai AFTER INSERT ON books BEGIN
+        {_bump("new")}
+        {_log("new", f"'{CHANGE_UPSERT}'")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS library_versions_ad AFTER DELETE ON books BEGIN
+        {_bump("old")}
+        {_log("old", f"'{CHANGE_DELETE}'")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS library_versions_au AFTER UPDATE ON books BEGIN
+        {_bump("old")}
+        {_log("old", f"CASE WHEN new.user_id IS old.user_id THEN '{CHANGE_UPSERT}' ELSE '{CHANGE_DELETE}' END")}
+        INSERT INTO library_versions (user_id, version) SELECT new.user_id, 1
+        WHERE new.user_id IS NOT NULL AND new.user_id IS NOT old.user_id
+        ON CONFLICT (user_id) DO UPDATE SET version = version + 1;
+        {_log("new", f"'{CHANGE_UPSERT}'", "new.user_id IS NOT old.user_id")}
+    END
+    """,
+]
+
+for statement in LIBRARY_VERSION_TRIGGERS:
+    event.listen(Base.metadata, "after_create", DDL(statement).execute_if(dialect="sqlite"))
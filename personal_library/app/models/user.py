@@ -1,9 +1,13 @@
+import os
 from sqlalchemy import Column, Integer, String, DateTime, Text
 from sqlalchemy.sql import func
 from passlib.context import CryptContext
 from app.database import Base
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Стоимость bcrypt; хэши с другой стоимостью пересчитываются при следующем входе
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
 class User(Base):
     __tablename__ = "users"
@@ -18,6 +22,11 @@ class User(Base):
     def verify_password(plain_password, hashed_password):
         return pwd_context.verify(plain_password, hashed_password)
     
+    @staticmethod
+    def verify_and_update_password(plain_password, hashed_password):
+        """(верен ли пароль, новый хэш или None, если пересчет не нужен)"""
+        return pwd_context.verify_and_update(plain_password, hashed_password)
+    
     @staticmethod
     def get_password_hash(password):
         if len(password) > 72:
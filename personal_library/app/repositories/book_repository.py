@@ -1,7 +1,236 @@
+from sqlalchemy import and_, or_, func, literal_column, text, table, column, insert, select, update, delete, Row
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.models.book import Book
-from app.schemas.book import BookCreate, BookUpdate
-from typing import List, Optional
+from app.models.book import Book, BookStatus, BOOKS_FTS_TABLE
+from app.models.book_stats import BookStat
+from app.models.book_change import BookChange
+from app.models.library_version import LibraryVersion
+from app.schemas.book import BookCreate, BookUpdate, BookFilter, BookQuery, SortOrder
+from typing import Any, AsyncIterator, List, Optional, Tuple
+
+# Строки только для чтения: выборка колонок через Core, без identity map и инструментирования ORM
+BookRow = Row
+BOOK_COLUMNS = tuple(Book.__table__.c)
+
+def book_columns(fields: Optional[Tuple[str, ...]] = None, *required: str) -> tuple:
+    """Колонки для разреженной выборки: невыбранные TEXT-колонки вообще не читаются с диска"""
+    if fields is None:
+        return BOOK_COLUMNS
+    names = set(fields).union(required)
+    return tuple(c for c in BOOK_COLUMNS if c.key in names)
+
+class BookQueries:
+    """Построение запросов, общее для синхронного и асинхронного репозиториев"""
+
+    @staticmethod
+    def rows_all():
+        return select(*BOOK_COLUMNS)
+
+    @staticmethod
+    def rows_by_user_id(user_id: int):
+        return select(*BOOK_COLUMNS).where(Book.user_id == user_id)
+
+    @staticmethod
+    def row_by_id(book_id: int):
+        return select(*BOOK_COLUMNS).where(Book.id == book_id)
+
+    @staticmethod
+    def by_user_id(user_id: int):
+        return select(Book).where(Book.user_id == user_id)
+
+    @staticmethod
+    def export_by_user_id(user_id: int, batch_size: int):
+        return (
+            select(*BOOK_COLUMNS)
+            .where(Book.user_id == user_id)
+            .order_by(Book.id)
+            .execution_options(yield_per=batch_size)
+        )
+
+    @staticmethod
+    def by_id(book_id: int):
+        return select(Book).where(Book.id == book_id)
+
+    @staticmethod
+    def owned(book_id: int, user_id: int):
+        return select(Book).where(Book.id == book_id, Book.user_id == user_id)
+
+    @staticmethod
+    def library_version(user_id: int):
+        return select(LibraryVersion.version).where(LibraryVersion.user_id == user_id)
+
+    @staticmethod
+    def changes_since(user_id: int, since: int, limit: int):
+        # Левое соединение с books отдает текущее состояние книги вместе с записью журнала
+        return (
+            select(BookChange.seq, BookChange.op, BookChange.book_id, *BOOK_COLUMNS)
+            .outerjoin(Book, and_(Book.id == BookChange.book_id, Book.user_id == BookChange.user_id))
+            .where(BookChange.user_id == user_id, BookChange.seq > since)
+            .order_by(BookChange.seq)
+            .limit(limit)
+        )
+
+    @staticmethod
+    def compact_changes(keep: int):
+        # Оставляет у каждого пользователя последние keep записей журнала
+        current = (
+            select(LibraryVersion.version)
+            .where(LibraryVersion.user_id == BookChange.user_id)
+            .scalar_subquery()
+        )
+        return delete(BookChange).where(BookChange.seq <= current - keep)
+
+    @staticmethod
+    def stats_by_user_id(user_id: int):
+        return select(BookStat).where(BookStat.user_id == user_id)
+
+    @classmethod
+    def page_by_user_id(
+        cls,
+        user_id: int,
+        limit: int,
+        params: Optional[BookQuery] = None,
+        after: Optional[Tuple[Any, int]] = None,
+        fields: Optional[Tuple[str, ...]] = None
+    ):
+        params = params or BookQuery()
+        # id и поле сортировки нужны для курсора, даже если клиент их не запросил
+        columns = book_columns(fields, "id", params.sort.value)
+        stmt = cls._apply_filters(select(*columns).where(Book.user_id == user_id), params)
+
+        sort_column = getattr(Book, params.sort.value)
+        descending = params.order == SortOrder.DESC
+
+        if after is not None:
+            stmt = stmt.where(cls._keyset_condition(sort_column, descending, *after))
+
+        if sort_column is Book.id:
+            order_by = [Book.id.desc() if descending else Book.id]
+        elif descending:
+            order_by = [sort_column.desc(), Book.id.desc()]
+        else:
+            order_by = [sort_column, Book.id]
+
+        return stmt.order_by(*order_by).limit(limit)
+
+    @staticmethod
+    def search_by_user_id(
+        user_id: int,
+        match: str,
+        limit: int,
+        after: Optional[Tuple[float, int]] = None
+    ):
+        books_fts = table(BOOKS_FTS_TABLE, column("rowid"))
+        score = func.bm25(literal_column(BOOKS_FTS_TABLE))
+
+        stmt = (
+            select(*BOOK_COLUMNS, score.label("score"))
+            .join(books_fts, books_fts.c.rowid == Book.id)
+            .where(text(f"{BOOKS_FTS_TABLE} MATCH :match").bindparams(match=match))
+            .where(Book.user_id == user_id)
+        )
+        # bm25 считается по всей таблице FTS, поэтому курсор (оценка, id) не стабилен при параллельных записях
+        if after is not None:
+            last_score, last_id = after
+            stmt = stmt.where(or_(
+                score > last_score,
+                and_(score == last_score, Book.id > last_id)
+            ))
+
+        return stmt.order_by(score, Book.id).limit(limit)
+
+    # Запись одним оператором с RETURNING: проверка владельца в WHERE, без SELECT до и refresh после
+    @classmethod
+    def create_returning(cls, book: BookCreate, user_id: int):
+        return insert(Book).values(**cls.column_values(book.model_dump()), user_id=user_id).returning(Book)
+
+    @classmethod
+    def update_returning(cls, book_id: int, user_id: int, values: dict):
+        return (
+            update(Book)
+            .where(Book.id == book_id, Book.user_id == user_id)
+            .values(**cls.column_values(values))
+            .returning(Book)
+            .execution_options(synchronize_session=False, populate_existing=True)
+        )
+
+    @classmethod
+    def update_many_returning(cls, user_id: int, values: dict, ids: Optional[List[int]] = None, filters: Optional[BookFilter] = None):
+        stmt = update(Book).where(Book.user_id == user_id)
+        if ids is not None:
+            stmt = stmt.where(Book.id.in_(ids))
+        if filters is not None:
+            stmt = cls._apply_filters(stmt, filters)
+        return (
+            stmt.values(**cls.column_values(values))
+            .returning(Book)
+            .execution_options(synchronize_session=False, populate_existing=True)
+        )
+
+    @staticmethod
+    def delete_returning(book_id: int, user_id: int):
+        return (
+            delete(Book)
+            .where(Book.id == book_id, Book.user_id == user_id)
+            .returning(Book.id)
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def column_values(data: dict) -> dict:
+        if data.get("status") is not None:
+            data["status"] = BookStatus(data["status"].value)
+        return data
+
+    @classmethod
+    def bulk_rows(cls, books: List[BookCreate], user_id: int) -> List[dict]:
+        rows = []
+        for book in books:
+            data = cls.column_values(book.model_dump())
+            data["user_id"] = user_id
+            rows.append(data)
+        return rows
+
+    @staticmethod
+    def _apply_filters(stmt, params: BookFilter):
+        if params.status is not None:
+            stmt = stmt.where(Book.status == BookStatus(params.status.value))
+        if params.genre is not None:
+            stmt = stmt.where(Book.genre == params.genre)
+        if params.rating_min is not None:
+            stmt = stmt.where(Book.rating >= params.rating_min)
+        if params.rating_max is not None:
+            stmt = stmt.where(Book.rating <= params.rating_max)
+        if params.end_date_from is not None:
+            stmt = stmt.where(Book.end_date >= params.end_date_from)
+        if params.end_date_to is not None:
+            stmt = stmt.where(Book.end_date <= params.end_date_to)
+        return stmt
+
+    @staticmethod
+    def _keyset_condition(sort_column, descending: bool, value, last_id: int):
+        # SQLite ставит NULL первыми при ASC и последними при DESC
+        if sort_column is Book.id:
+            return Book.id < last_id if descending else Book.id > last_id
+
+        if descending:
+            if value is None:
+                return and_(sort_column.is_(None), Book.id < last_id)
+            return or_(
+                sort_column < value,
+                and_(sort_column == value, Book.id < last_id),
+                sort_column.is_(None)
+            )
+
+        if value is None:
+            return or_(
+                and_(sort_column.is_(None), Book.id > last_id),
+                sort_column.isnot(None)
+            )
+        return or_(
+            sort_column > value,
+            and_(sort_column == value, Book.id > last_id)
+        )
 
 class BookRepository:
     def __init__(self, db: Session):
@@ -11,32 +240,124 @@ class BookRepository:
         return self.db.query(Book).all()
 
     def get_by_user_id(self, user_id: int) -> List[Book]:
-        return self.db.query(Book).filter(Book.user_id == user_id).all()
+        return list(self.db.scalars(BookQueries.by_user_id(user_id)))
+
+    def compact_changes(self, keep: int) -> int:
+        try:
+            result = self.db.execute(BookQueries.compact_changes(keep))
+            self.db.commit()
+            return result.rowcount
+        except Exception:
+            self.db.rollback()
+            raise
 
     def get_by_id(self, book_id: int) -> Optional[Book]:
-        return self.db.query(Book).filter(Book.id == book_id).first()
+        return self.db.scalar(BookQueries.by_id(book_id))
 
     def create(self, book: BookCreate, user_id: int) -> Book:
-        db_book = Book(**book.dict(), user_id=user_id)
-        self.db.add(db_book)
+        db_book = self.db.scalar(BookQueries.create_returning(book, user_id))
         self.db.commit()
-        self.db.refresh(db_book)
         return db_book
 
     def update(self, book_id: int, book_update: BookUpdate, user_id: int) -> Optional[Book]:
-        db_book = self.db.query(Book).filter(Book.id == book_id, Book.user_id == user_id).first()
-        if db_book:
-            update_data = book_update.dict(exclude_unset=True)
-            for field, value in update_data.items():
-                setattr(db_book, field, value)
-            self.db.commit()
-            self.db.refresh(db_book)
+        update_data = book_update.model_dump(exclude_unset=True)
+        if not update_data:
+            return self.db.scalar(BookQueries.owned(book_id, user_id))
+        db_book = self.db.scalar(BookQueries.update_returning(book_id, user_id, update_data))
+        self.db.commit()
         return db_book
 
     def delete(self, book_id: int, user_id: int) -> bool:
-        db_book = self.db.query(Book).filter(Book.id == book_id, Book.user_id == user_id).first()
-        if db_book:
-            self.db.delete(db_book)
-            self.db.commit()
-            return True
-        return False
\ No newline at end of file
+        deleted_id = self.db.scalar(BookQueries.delete_returning(book_id, user_id))
+        self.db.commit()
+        return deleted_id is not None
+
+class AsyncBookRepository:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_rows_by_user_id(self, user_id: int) -> List[BookRow]:
+        return (await self.db.execute(BookQueries.rows_by_user_id(user_id))).all()
+
+    async def get_row_by_id(self, book_id: int) -> Optional[BookRow]:
+        return (await self.db.execute(BookQueries.row_by_id(book_id))).first()
+
+    async def iter_by_user_id(self, user_id: int, batch_size: int) -> AsyncIterator[BookRow]:
+        result = await self.db.stream(BookQueries.export_by_user_id(user_id, batch_size))
+        async for row in result:
+            yield row
+
+    async def get_page_by_user_id(
+        self,
+        user_id: int,
+        limit: int,
+        params: Optional[BookQuery] = None,
+        after: Optional[Tuple[Any, int]] = None,
+        fields: Optional[Tuple[str, ...]] = None
+    ) -> List[BookRow]:
+        return (await self.db.execute(BookQueries.page_by_user_id(user_id, limit, params, after, fields))).all()
+
+    async def get_library_version(self, user_id: int) -> int:
+        return await self.db.scalar(BookQueries.library_version(user_id)) or 0
+
+    async def get_changes_since(self, user_id: int, since: int, limit: int) -> List[BookRow]:
+        return (await self.db.execute(BookQueries.changes_since(user_id, since, limit))).all()
+
+    async def get_stats_by_user_id(self, user_id: int) -> List[BookStat]:
+        return list(await self.db.scalars(BookQueries.stats_by_user_id(user_id)))
+
+    async def search_by_user_id(
+        self,
+        user_id: int,
+        match: str,
+        limit: int,
+        after: Optional[Tuple[float, int]] = None
+    ) -> List[BookRow]:
+        return (await self.db.execute(BookQueries.search_by_user_id(user_id, match, limit, after))).all()
+
+    async def create(self, book: BookCreate, user_id: int) -> Book:
+        db_book = await self.db.scalar(BookQueries.create_returning(book, user_id))
+        await self.db.commit()
+        return db_book
+
+    async def bulk_create(self, books: List[BookCreate], user_id: int) -> int:
+        if not books:
+            return 0
+        rows = BookQueries.bulk_rows(books, user_id)
+        try:
+            await self.db.execute(insert(Book), rows)
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
+        return len(rows)
+
+    async def update(self, book_id: int, book_update: BookUpdate, user_id: int) -> Optional[Book]:
+        update_data = book_update.model_dump(exclude_unset=True)
+        if not update_data:
+            return await self.db.scalar(BookQueries.owned(book_id, user_id))
+        db_book = await self.db.scalar(BookQueries.update_returning(book_id, user_id, update_data))
+        await self.db.commit()
+        return db_book
+
+    async def delete(self, book_id: int, user_id: int) -> bool:
+        deleted_id = await self.db.scalar(BookQueries.delete_returning(book_id, user_id))
+        await self.db.commit()
+        return deleted_id is not None
+
+    async def batch_update(self, user_id: int, groups: List[Tuple[List[int], dict]]) -> List[Book]:
+        try:
+            books = []
+            for ids, values in groups:
+                books.extend(await self.db.scalars(BookQueries.update_many_returning(user_id, values, ids=ids)))
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
+        return books
+
+    async def update_by_filter(self, user_id: int, filters: BookFilter, book_update: BookUpdate) -> List[Book]:
+        stmt = BookQueries.update_many_returning(user_id, book_update.model_dump(exclude_unset=True), filters=filters)
+        books = list(await self.db.scalars(stmt))
+        await self.db.commit()
+        return books
@@ -0,0 +1,82 @@
+from sqlalchemy import String, select, tuple_, type_coerce, update, Row
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.chat import ChatMessage
+from app.models.chat_conversation import ChatConversation
+from app.models.user import User
+from typing import List, Optional, Tuple
+
+ChatRow = Row
+CHAT_MESSAGE_COLUMNS = tuple(ChatMessage.__table__.c)
+
+# created_at в том виде, в каком он хранится в SQLite. Курсор сравнивается с сохраненным текстом напрямую:
+# привязанный datetime превращается в строку с ".000000" и не совпал бы со значением CURRENT_TIMESTAMP
+CREATED_AT_RAW = type_coerce(ChatMessage.created_at, String)
+LAST_MESSAGE_AT_RAW = type_coerce(ChatConversation.last_message_at, String)
+
+CONVERSATION_COLUMNS = tuple(ChatConversation.__table__.c)
+
+def chat_message_columns(fields: Optional[Tuple[str, ...]] = None) -> tuple:
+    if fields is None:
+        return CHAT_MESSAGE_COLUMNS
+    names = set(fields).union(("id",))
+    return tuple(c for c in CHAT_MESSAGE_COLUMNS if c.key in names)
+
+class ChatQueries:
+    @staticmethod
+    def history(
+        user_id: Optional[int],
+        limit: int,
+        before: Optional[Tuple[str, int]] = None,
+        fields: Optional[Tuple[str, ...]] = None
+    ):
+        """
+        Сообщения от новых к старым. user_id=None — общая история для администратора.
+        before — (created_at, id) последнего полученного сообщения
+        """
+        stmt = select(*chat_message_columns(fields), CREATED_AT_RAW.label("cursor_created_at"))
+        if user_id is not None:
+            stmt = stmt.where(ChatMessage.user_id == user_id)
+        if before is not None:
+            # Сравнение значений строк SQLite выполняет поиском по индексу, а не перебором
+            stmt = stmt.where(tuple_(CREATED_AT_RAW, ChatMessage.id) < tuple_(*before))
+        return stmt.order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc()).limit(limit)
+
+    @staticmethod
+    def conversations(limit: int, before: Optional[Tuple[str, int]] = None):
+        """Диалоги от недавних к давним: чтение сводной таблицы по индексу, email — по первичному ключу users"""
+        stmt = (
+            select(*CONVERSATION_COLUMNS, User.email, LAST_MESSAGE_AT_RAW.label("cursor_created_at"))
+            .join(User, User.id == ChatConversation.user_id)
+        )
+        if before is not None:
+            stmt = stmt.where(tuple_(LAST_MESSAGE_AT_RAW, ChatConversation.user_id) < tuple_(*before))
+        return stmt.order_by(ChatConversation.last_message_at.desc(), ChatConversation.user_id.desc()).limit(limit)
+
+class AsyncChatRepository:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_history(
+        self,
+        user_id: Optional[int],
+        limit: int,
+        before: Optional[Tuple[str, int]] = None,
+        fields: Optional[Tuple[str, ...]] = None
+    ) -> List[ChatRow]:
+        result = await self.db.execute(ChatQueries.history(user_id, limit, before, fields))
+        return result.all()
+
+    async def get_conversations(self, limit: int, before: Optional[Tuple[str, int]] = None) -> List[ChatRow]:
+        result = await self.db.execute(ChatQueries.conversations(limit, before))
+        return result.all()
+
+    async def mark_conversation_read(self, user_id: int) -> bool:
+        result = await self.db.execute(
+            update(ChatConversation)
+            .where(ChatConversation.user_id == user_id)
+            .values(unread_count=0)
+            .returning(ChatConversation.user_id)
+        )
+        found = result.first() is not None
+        await self.db.commit()
+        return found
@@ -1,7 +1,6 @@
 from enum import Enum
-from pydantic import BaseModel, Field, validator
-from pydantic import BaseModel, field_validator
-from typing import Optional
+from pydantic import BaseModel, Field, TypeAdapter, ValidationInfo, field_validator, model_validator
+from typing import Dict, List, Optional, Tuple
 from datetime import date
 
 class BookStatus(str, Enum):
@@ -9,6 +8,27 @@ class BookStatus(str, Enum):
     PLANNED = "PLANNED"
     READ = "READ"
 
+class BookSortField(str, Enum):
+    ID = "id"
+    RATING = "rating"
+    END_DATE = "end_date"
+
+class SortOrder(str, Enum):
+    ASC = "asc"
+    DESC = "desc"
+
+class BookFilter(BaseModel):
+    status: Optional[BookStatus] = None
+    genre: Optional[str] = None
+    rating_min: Optional[int] = Field(None, ge=1, le=5)
+    rating_max: Optional[int] = Field(None, ge=1, le=5)
+    end_date_from: Optional[date] = None
+    end_date_to: Optional[date] = None
+
+class BookQuery(BookFilter):
+    sort: BookSortField = BookSortField.ID
+    order: SortOrder = SortOrder.ASC
+
 class BookCreate(BaseModel):
     title: str
     author: str
@@ -38,9 +58,10 @@ class BookBase(BaseModel):
     end_date: Optional[date] = None
     status: BookStatus = BookStatus.PLANNED
 
-    @validator('end_date')
-    def validate_dates(cls, end_date, values):
-        start_date = values.get('start_date')
+    @field_validator('end_date')
+    @classmethod
+    def validate_dates(cls, end_date, info: ValidationInfo):
+        start_date = info.data.get('start_date')
         if start_date and end_date and end_date < start_date:
             raise ValueError('Дата окончания не может быть раньше даты начала')
         return end_date
@@ -61,4 +82,103 @@ class BookResponse(BookBase):
     user_id: int  
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+    @classmethod
+    def from_row(cls, book, fields: Optional[Tuple[str, ...]] = None) -> "BookResponse":
+        """
+        Сборка ответа из строки БД без повторной валидации: данные уже проверены при записи.
+        fields — набор выбранных колонок для разреженного ответа
+        """
+        if fields is None:
+            fields = BOOK_RESPONSE_FIELDS
+
+        values = {field: getattr(book, field) for field in fields}
+        if "status" in values:
+            status = values["status"]
+            values["status"] = BookStatus(status.value) if status is not None else BookStatus.PLANNED
+        return cls.model_construct(**values)
+
+BOOK_RESPONSE_FIELDS = tuple(BookResponse.model_fields)
+
+class BookPage(BaseModel):
+    items: List[BookResponse]
+    next_cursor: Optional[str] = None
+
+book_response_adapter = TypeAdapter(BookResponse)
+book_page_adapter = TypeAdapter(BookPage)
+
+class BookImportError(BaseModel):
+    line: int
+    error: str
+
+class BookImportResult(BaseModel):
+    inserted: int = 0
+    failed: int = 0
+    errors: List[BookImportError] = []
+    elapsed_seconds: float = 0.0
+    rows_per_second: float = 0.0
+
+class BookStatsResponse(BaseModel):
+    total: int = 0
+    by_status: Dict[str, int] = {}
+    by_genre: Dict[str, int] = {}
+    by_rating: Dict[int, int] = {}
+    average_rating: Optional[float] = None
+    finished_per_month: Dict[str, int] = {}
+
+class BookChangeOp(str, Enum):
+    UPSERT = "upsert"
+    DELETE = "delete"
+
+class BookChangeItem(BaseModel):
+    seq: int
+    op: BookChangeOp
+    book_id: int
+    # Текущее состояние книги для upsert; None, если книга уже удалена более поздним изменением
+    book: Optional[BookResponse] = None
+
+class BookChangesResponse(BaseModel):
+    changes: List[BookChangeItem] = []
+    next_since: int
+    has_more: bool = False
+    # Журнал сжат дальше since: клиенту нужно заново загрузить библиотеку и продолжить с next_since
+    resync_required: bool = False
+
+book_changes_adapter = TypeAdapter(BookChangesResponse)
+
+MAX_BATCH_SIZE = 1000
+
+class BookBatchItem(BaseModel):
+    id: int
+    patch: BookUpdate
+
+class BookBatchUpdate(BaseModel):
+    items: Optional[List[BookBatchItem]] = Field(None, max_length=MAX_BATCH_SIZE)
+    filter: Optional[BookFilter] = None
+    patch: Optional[BookUpdate] = None
+
+    @model_validator(mode='after')
+    def check_mode(self):
+        if (self.items is None) == (self.filter is None):
+            raise ValueError('Укажите либо items, либо filter вместе с patch')
+        if self.filter is not None:
+            if self.patch is None or not self.patch.model_fields_set:
+                raise ValueError('Для изменения по фильтру нужен непустой patch')
+            # Пустой фильтр переписал бы всю библиотеку пользователя
+            if not self.filter.model_dump(exclude_none=True):
+                raise ValueError('Фильтр должен содержать хотя бы одно условие')
+        if self.items is not None and self.patch is not None:
+            raise ValueError('patch указывается только вместе с filter')
+        return self
+
+class BookBatchItemResult(BaseModel):
+    id: int
+    ok: bool
+    book: Optional[BookResponse] = None
+    error: Optional[str] = None
+
+class BookBatchResult(BaseModel):
+    updated: int = 0
+    failed: int = 0
+    results: List[BookBatchItemResult] = []
\ No newline at end of file
@@ -1,6 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 class ChatMessageCreate(BaseModel):
     message: str
@@ -14,4 +14,32 @@ class ChatMessageResponse(BaseModel):
     email: Optional[str] = None
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# Поля, доступные в ?fields=: только колонки таблицы chat_messages
+CHAT_MESSAGE_FIELDS = ("id", "user_id", "message", "is_admin", "created_at")
+
+class ChatMessagePage(BaseModel):
+    """Страница истории от новых к старым; next_cursor передается в before для более старых сообщений"""
+    items: List[ChatMessageResponse]
+    next_cursor: Optional[str] = None
+
+chat_message_page_adapter = TypeAdapter(ChatMessagePage)
+
+class ChatConversationResponse(BaseModel):
+    user_id: int
+    email: Optional[str] = None
+    last_message_id: int
+    last_message: str
+    last_is_admin: int
+    last_message_at: Optional[datetime] = None
+    unread_count: int
+
+    class Config:
+        from_attributes = True
+
+class ChatConversationPage(BaseModel):
+    items: List[ChatConversationResponse]
+    next_cursor: Optional[str] = None
+
+chat_conversation_page_adapter = TypeAdapter(ChatConversationPage)
@@ -1,35 +1,361 @@
-from app.repositories.book_repository import BookRepository
-from app.schemas.book import BookCreate, BookUpdate, BookResponse
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from app.repositories.book_repository import AsyncBookRepository
+from app.services.cache import CacheBackend, book_cache
+from app.schemas.book import (
+    BookCreate, BookUpdate, BookResponse, BookPage, BookQuery, BookSortField, BookImportError,
+    BookStatsResponse, BookBatchUpdate, BookBatchItemResult, BookBatchResult,
+    BookChangeOp, BookChangeItem, BookChangesResponse
+)
+from app.models.book_stats import BookStat, STAT_STATUS, STAT_GENRE, STAT_RATING, STAT_MONTH
+from app.utils.bulk_import import CSV, EXPORT_BATCH_SIZE
+from pydantic import ValidationError
+from app.utils.pagination import encode_cursor, decode_cursor
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date
+import csv
+import io
+import json
+from collections import Counter
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
 
-class BookService:
-    def __init__(self, db: Session):
-        self.repository = BookRepository(db)
+class BookServiceBase:
+    """Логика, не зависящая от способа доступа к БД: курсоры, кэш, сборка ответов"""
 
-    def get_all_books(self) -> List[BookResponse]:
-        books = self.repository.get_all()
-        return [BookResponse.model_validate(book) for book in books]
+    def __init__(self, cache: Optional[CacheBackend] = book_cache):
+        self.cache = cache
 
-    def get_books_by_user(self, user_id: int) -> List[BookResponse]:
-        books = self.repository.get_by_user_id(user_id)
-        return [BookResponse.model_validate(book) for book in books]
+    def _page_key(
+        self,
+        user_id: int,
+        version: int,
+        limit: int,
+        cursor: Optional[str],
+        params: BookQuery,
+        fields: Optional[Tuple[str, ...]] = None
+    ) -> Optional[str]:
+        return self._user_key(
+            user_id, version, "page", limit, cursor,
+            json.dumps(params.model_dump(mode="json"), sort_keys=True),
+            ",".join(fields) if fields else "*"
+        )
 
-    def get_book_by_id(self, book_id: int) -> Optional[BookResponse]:
-        book = self.repository.get_by_id(book_id)
+    @staticmethod
+    def _build_page(books: list, limit: int, params: BookQuery, fields: Optional[Tuple[str, ...]] = None) -> BookPage:
+        next_cursor = None
+        if len(books) > limit:
+            books = books[:limit]
+            last = books[-1]
+            next_cursor = encode_cursor({
+                "sort": params.sort.value,
+                "order": params.order.value,
+                "value": getattr(last, params.sort.value),
+                "id": last.id
+            })
+
+        return BookPage(
+            items=[BookResponse.from_row(book, fields) for book in books],
+            next_cursor=next_cursor
+        )
+
+    @staticmethod
+    def _build_changes(rows: list, since: int, version: int, limit: int) -> BookChangesResponse:
+        # Журнал непрерывен, поэтому отсутствие записи since + 1 означает, что он сжат дальше since
+        if since > version or (since < version and (not rows or rows[0].seq != since + 1)):
+            return BookChangesResponse(next_since=version, resync_required=True)
+        if not rows:
+            return BookChangesResponse(next_since=version)
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        changes = [
+            BookChangeItem(
+                seq=row.seq,
+                op=BookChangeOp(row.op),
+                book_id=row.book_id,
+                book=BookResponse.from_row(row) if row.op == BookChangeOp.UPSERT and row.id is not None else None
+            )
+            for row in rows
+        ]
+        return BookChangesResponse(changes=changes, next_since=rows[-1].seq, has_more=has_more)
+
+    @staticmethod
+    def _build_stats(rows: Iterable[BookStat]) -> BookStatsResponse:
+        stats = BookStatsResponse()
+        for stat in rows:
+            if stat.kind == STAT_STATUS:
+                stats.by_status[stat.key] = stat.count
+                stats.total += stat.count
+            elif stat.kind == STAT_GENRE:
+                stats.by_genre[stat.key] = stat.count
+            elif stat.kind == STAT_RATING:
+                stats.by_rating[int(stat.key)] = stat.count
+            elif stat.kind == STAT_MONTH:
+                stats.finished_per_month[stat.key] = stat.count
+
+        rated = sum(stats.by_rating.values())
+        if rated:
+            total_rating = sum(rating * count for rating, count in stats.by_rating.items())
+            stats.average_rating = round(total_rating / rated, 2)
+        stats.finished_per_month = dict(sorted(stats.finished_per_month.items()))
+        return stats
+
+    @staticmethod
+    def _parse_search_cursor(cursor: Optional[str]) -> Optional[Tuple[float, int]]:
+        data = decode_cursor(cursor)
+        if data is None:
+            return None
+        last_score, last_id = data.get("score"), data.get("id")
+        if not isinstance(last_score, (int, float)) or not isinstance(last_id, int):
+            raise ValueError("Неверный курсор")
+        return last_score, last_id
+
+    @staticmethod
+    def _build_search_page(rows: list, limit: int) -> BookPage:
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor({"score": last.score, "id": last.id})
+
+        return BookPage(
+            items=[BookResponse.from_row(row) for row in rows],
+            next_cursor=next_cursor
+        )
+
+    @staticmethod
+    def _build_match_query(q: str) -> str:
+        # Каждое слово — отдельная префиксная фраза, чтобы синтаксис FTS5 из запроса не интерпретировался
+        terms = [term.replace('"', '""') for term in q.split()]
+        return " ".join(f'"{term}"*' for term in terms)
+
+    @staticmethod
+    def _parse_cursor(cursor: Optional[str], params: BookQuery) -> Optional[Tuple[Any, int]]:
+        data = decode_cursor(cursor)
+        if data is None:
+            return None
+
+        last_id = data.get("id")
+        if (
+            not isinstance(last_id, int)
+            or data.get("sort") != params.sort.value
+            or data.get("order") != params.order.value
+        ):
+            raise ValueError("Неверный курсор")
+
+        value = data.get("value")
+        if params.sort == BookSortField.END_DATE and value is not None:
+            value = date.fromisoformat(value)
+        return value, last_id
+
+    @staticmethod
+    def _validate_records(records: List[Tuple[int, dict]]) -> Tuple[List[BookCreate], List[BookImportError]]:
+        books = []
+        errors = []
+        for line, record in records:
+            try:
+                books.append(BookCreate.model_validate(record))
+            except ValidationError as e:
+                details = "; ".join(
+                    f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}"
+                    for err in e.errors()
+                )
+                errors.append(BookImportError(line=line, error=details))
+        return books, errors
+
+    @staticmethod
+    def _group_batch_items(batch: BookBatchUpdate) -> Tuple[List[Tuple[List[int], dict]], Dict[int, str]]:
+        # Элементы с одинаковым набором изменений обновляются одним UPDATE ... WHERE id IN (...)
+        groups: Dict[str, Tuple[List[int], dict]] = {}
+        errors: Dict[int, str] = {}
+        counts = Counter(item.id for item in batch.items)
+        for item in batch.items:
+            if counts[item.id] > 1:
+                errors[item.id] = "Книга указана в пакете несколько раз"
+                continue
+
+            values = item.patch.model_dump(exclude_unset=True)
+            if not values:
+                errors[item.id] = "Нет изменяемых полей"
+                continue
+
+            group_key = json.dumps(item.patch.model_dump(mode="json", exclude_unset=True), sort_keys=True)
+            groups.setdefault(group_key, ([], values))[0].append(item.id)
+        return list(groups.values()), errors
+
+    @staticmethod
+    def _build_batch_result(batch: BookBatchUpdate, books: list, errors: Dict[int, str]) -> BookBatchResult:
+        updated = {book.id: BookResponse.from_row(book) for book in books}
+        result = BookBatchResult(updated=len(updated))
+        reported = set()
+        for item in batch.items:
+            if item.id in reported:
+                continue
+            reported.add(item.id)
+            if item.id in updated:
+                result.results.append(BookBatchItemResult(id=item.id, ok=True, book=updated[item.id]))
+            else:
+                error = errors.get(item.id, "Книга не найдена или у вас нет прав для ее редактирования")
+                result.results.append(BookBatchItemResult(id=item.id, ok=False, error=error))
+        result.failed = len(result.results) - result.updated
+        return result
+
+    @staticmethod
+    def _build_filter_result(books: list) -> BookBatchResult:
+        return BookBatchResult(
+            updated=len(books),
+            results=[
+                BookBatchItemResult(id=book.id, ok=True, book=BookResponse.from_row(book))
+                for book in books
+            ]
+        )
+
+    @staticmethod
+    def _export_writer(fmt: str):
+        fields = list(BookResponse.model_fields)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer) if fmt == CSV else None
+        if writer:
+            writer.writerow(fields)
+
+        def write(book) -> None:
+            item = BookResponse.from_row(book)
+            if writer:
+                data = item.model_dump(mode="json")
+                writer.writerow(["" if data[field] is None else data[field] for field in fields])
+            else:
+                buffer.write(item.model_dump_json())
+                buffer.write("\n")
+
+        def flush() -> str:
+            chunk = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            return chunk
+
+        return write, flush
+
+    # Ключи включают версию библиотеки из library_versions. Ее увеличивают триггеры при любой записи в books,
+    # в том числе из CLI и других процессов, поэтому после записи старые записи кэша просто перестают читаться
+    def _user_key(self, user_id: int, version: int, *parts) -> Optional[str]:
+        if self.cache is None:
+            return None
+        return ":".join([f"books:user:{user_id}", f"v{version}"] + [str(part) for part in parts])
+
+    def _cache_get(self, key: Optional[str]):
+        if self.cache is None or key is None:
+            return None
+        return self.cache.get(key)
+
+    def _cache_set(self, key: Optional[str], value) -> None:
+        if self.cache is not None and key is not None:
+            self.cache.set(key, value)
+
+class AsyncBookService(BookServiceBase):
+    def __init__(self, db: AsyncSession, cache: Optional[CacheBackend] = book_cache):
+        super().__init__(cache)
+        self.repository = AsyncBookRepository(db)
+
+    async def get_books_page(
+        self,
+        user_id: int,
+        limit: int,
+        cursor: Optional[str] = None,
+        params: Optional[BookQuery] = None,
+        fields: Optional[Tuple[str, ...]] = None,
+        version: Optional[int] = None
+    ) -> BookPage:
+        """version — уже прочитанная версия библиотеки (для ETag); иначе читается здесь"""
+        params = params or BookQuery()
+        after = self._parse_cursor(cursor, params)
+
+        if version is None:
+            version = await self.repository.get_library_version(user_id)
+        key = self._page_key(user_id, version, limit, cursor, params, fields)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        books = await self.repository.get_page_by_user_id(user_id, limit + 1, params, after, fields)
+        page = self._build_page(books, limit, params, fields)
+        self._cache_set(key, page)
+        return page
+
+    async def get_library_version(self, user_id: int) -> int:
+        return await self.repository.get_library_version(user_id)
+
+    async def get_stats(self, user_id: int) -> BookStatsResponse:
+        return self._build_stats(await self.repository.get_stats_by_user_id(user_id))
+
+    async def get_changes(self, user_id: int, since: int, limit: int) -> BookChangesResponse:
+        version = await self.repository.get_library_version(user_id)
+        rows = await self.repository.get_changes_since(user_id, since, limit + 1) if since < version else []
+        return self._build_changes(rows, since, version, limit)
+
+    async def search_books(self, user_id: int, q: str, limit: int, cursor: Optional[str] = None) -> BookPage:
+        match = self._build_match_query(q)
+        if not match:
+            return BookPage(items=[])
+
+        after = self._parse_search_cursor(cursor)
+        rows = await self.repository.search_by_user_id(user_id, match, limit + 1, after)
+        return self._build_search_page(rows, limit)
+
+    async def export_books(self, user_id: int, fmt: str) -> AsyncIterator[str]:
+        write, flush = self._export_writer(fmt)
+        count = 0
+        async for book in self.repository.iter_by_user_id(user_id, EXPORT_BATCH_SIZE):
+            write(book)
+            count += 1
+            if count % EXPORT_BATCH_SIZE == 0:
+                yield flush()
+
+        chunk = flush()
+        if chunk:
+            yield chunk
+
+    async def get_book_by_id(self, book_id: int, user_id: int, version: int) -> Optional[BookResponse]:
+        """
+        Книга кэшируется под версией библиотеки запрашивающего пользователя: чужая книга все равно
+        отклоняется контроллером, а передача книги между пользователями увеличивает версии обоих
+        """
+        key = self._user_key(user_id, version, "id", book_id)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
+        book = await self.repository.get_row_by_id(book_id)
         if book:
-            return BookResponse.model_validate(book)
+            result = BookResponse.from_row(book)
+            self._cache_set(key, result)
+            return result
         return None
 
-    def create_book(self, book_data: BookCreate, user_id: int) -> BookResponse:
-        book = self.repository.create(book_data, user_id)
-        return BookResponse.model_validate(book)
+    async def create_book(self, book_data: BookCreate, user_id: int) -> BookResponse:
+        book = await self.repository.create(book_data, user_id)
+        return BookResponse.from_row(book)
+
+    async def import_books(
+        self,
+        records: List[Tuple[int, dict]],
+        user_id: int
+    ) -> Tuple[int, List[BookImportError]]:
+        books, errors = self._validate_records(records)
+        inserted = await self.repository.bulk_create(books, user_id)
+        return inserted, errors
 
-    def update_book(self, book_id: int, book_data: BookUpdate, user_id: int) -> Optional[BookResponse]:
-        book = self.repository.update(book_id, book_data, user_id)
+    async def update_book(self, book_id: int, book_data: BookUpdate, user_id: int) -> Optional[BookResponse]:
+        book = await self.repository.update(book_id, book_data, user_id)
         if book:
-            return BookResponse.model_validate(book)
+            return BookResponse.from_row(book)
         return None
 
-    def delete_book(self, book_id: int, user_id: int) -> bool:
-        return self.repository.delete(book_id, user_id)
+    async def delete_book(self, book_id: int, user_id: int) -> bool:
+        return await self.repository.delete(book_id, user_id)
+
+    async def batch_update_books(self, batch: BookBatchUpdate, user_id: int) -> BookBatchResult:
+        if batch.filter is not None:
+            books = await self.repository.update_by_filter(user_id, batch.filter, batch.patch)
+            return self._build_filter_result(books)
+
+        groups, errors = self._group_batch_items(batch)
+        books = await self.repository.batch_update(user_id, groups) if groups else []
+        return self._build_batch_result(batch, books, errors)
@@ -0,0 +1,152 @@
+import asyncio
+import json
+import os
+import time
+from abc import ABC, abstractmethod
+from contextlib import suppress
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table, Text, delete, event, func, insert, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+CHAT_BROKER = os.getenv("CHAT_BROKER", "memory")
+CHAT_BROKER_URL = os.getenv("CHAT_BROKER_URL", "sqlite+aiosqlite:///./broker.db")
+BROKER_POLL_INTERVAL_SECONDS = 0.05
+BROKER_RETENTION_SECONDS = 60
+
+BrokerHandler = Callable[[str, dict], Awaitable[None]]
+
+class Broker(ABC):
+    """
+    Публикация сообщений чата между процессами сервера.
+    Каждый процесс подписывается одним обработчиком и доставляет сообщения своим локальным соединениям,
+    в том числе собственные: отдельного пути локальной доставки нет.
+    """
+
+    def __init__(self):
+        self.handler: Optional[BrokerHandler] = None
+
+    async def start(self, handler: BrokerHandler) -> None:
+        self.handler = handler
+
+    async def stop(self) -> None:
+        self.handler = None
+
+    @abstractmethod
+    async def publish(self, channel: str, message: dict) -> None:
+        ...
+
+    async def dispatch(self, channel: str, message: dict) -> None:
+        if self.handler is None:
+            return
+        try:
+            await self.handler(channel, message)
+        except Exception as e:
+            print(f"❌ Ошибка доставки сообщения брокера: {e}")
+
+class InMemoryBroker(Broker):
+    """Брокер в пределах одного процесса"""
+
+    async def publish(self, channel: str, message: dict) -> None:
+        await self.dispatch(channel, message)
+
+broker_metadata = MetaData()
+
+# AUTOINCREMENT: id не переиспользуются после очистки, иначе опрос по id > last_id пропустит сообщения
+broker_messages = Table(
+    "broker_messages",
+    broker_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("channel", String(50), nullable=False),
+    Column("payload", Text, nullable=False),
+    Column("created_at", Float, nullable=False),
+    sqlite_autoincrement=True,
+)
+
+class SQLiteBroker(Broker):
+    """
+    Брокер для нескольких процессов на одном хосте: общая таблица сообщений в отдельном файле SQLite.
+    Каждый процесс опрашивает ее по возрастанию id; старые сообщения периодически удаляются
+    """
+
+    def __init__(
+        self,
+        url: str = CHAT_BROKER_URL,
+        poll_interval: float = BROKER_POLL_INTERVAL_SECONDS,
+        retention: float = BROKER_RETENTION_SECONDS
+    ):
+        super().__init__()
+        self.engine = create_async_engine(url)
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.last_id = 0
+        self._task: Optional[asyncio.Task] = None
+
+        @event.listens_for(self.engine.sync_engine, "connect")
+        def _enable_wal(dbapi_connection, connection_record):
+            # WAL позволяет процессам читать таблицу во время записи другими процессами
+            cursor = dbapi_connection.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.close()
+
+    async def start(self, handler: BrokerHandler) -> None:
+        await super().start(handler)
+        async with self.engine.begin() as conn:
+            await conn.run_sync(broker_metadata.create_all)
+            # Процесс получает только сообщения, опубликованные после его запуска
+            self.last_id = await conn.scalar(select(func.max(broker_messages.c.id))) or 0
+        self._task = asyncio.create_task(self._poll())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        await self.engine.dispose()
+        await super().stop()
+
+    async def publish(self, channel: str, message: dict) -> None:
+        async with self.engine.begin() as conn:
+            await conn.execute(insert(broker_messages).values(
+                channel=channel,
+                payload=json.dumps(message),
+                created_at=time.time()
+            ))
+
+    async def _poll(self) -> None:
+        last_cleanup = time.monotonic()
+        while True:
+            try:
+                async with self.engine.connect() as conn:
+                    rows = (await conn.execute(
+                        select(broker_messages.c.id, broker_messages.c.channel, broker_messages.c.payload)
+                        .where(broker_messages.c.id > self.last_id)
+                        .order_by(broker_messages.c.id)
+                    )).all()
+
+                for row in rows:
+                    self.last_id = row.id
+                    await self.dispatch(row.channel, json.loads(row.payload))
+
+                if time.monotonic() - last_cleanup >= self.retention:
+                    async with self.engine.begin() as conn:
+                        await conn.execute(
+                            delete(broker_messages).where(broker_messages.c.created_at < time.time() - self.retention)
+                        )
+                    last_cleanup = time.monotonic()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Ошибка опроса брокера: {e}")
+
+            await asyncio.sleep(self.poll_interval)
+
+def create_broker(kind: str = CHAT_BROKER) -> Broker:
+    if kind == "memory":
+        return InMemoryBroker()
+    if kind == "sqlite":
+        return SQLiteBroker()
+    raise ValueError(f"Неизвестный тип брокера: {kind}")
+
+chat_broker = create_broker()
@@ -0,0 +1,120 @@
+import asyncio
+from contextlib import suppress
+from datetime import datetime
+from typing import List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import insert
+
+from app.database import SessionLocal
+from app.models.chat import ChatMessage
+
+CHAT_WRITE_BATCH_SIZE = 200
+CHAT_WRITE_MAX_DELAY_SECONDS = 0.005
+
+class SavedMessage(NamedTuple):
+    id: int
+    created_at: datetime
+
+class ChatMessageWriter:
+    """
+    Отложенная запись сообщений чата с групповым коммитом.
+    Сообщения копятся в очереди до CHAT_WRITE_BATCH_SIZE штук или CHAT_WRITE_MAX_DELAY_SECONDS,
+    затем пишутся одной транзакцией в потоке, чтобы fsync не останавливал цикл событий.
+    save() возвращает результат только после коммита пакета
+    """
+
+    def __init__(self, batch_size: int = CHAT_WRITE_BATCH_SIZE, max_delay: float = CHAT_WRITE_MAX_DELAY_SECONDS):
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.messages = 0
+
+    async def start(self) -> None:
+        self.queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        # None в очереди: записать накопленное и завершиться
+        if self._task is None:
+            return
+        self.queue.put_nowait(None)
+        with suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    async def save(self, user_id: int, message: str, is_admin: int) -> SavedMessage:
+        if self._task is None:
+            raise RuntimeError("Запись сообщений чата не запущена")
+
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait(({"user_id": user_id, "message": message, "is_admin": is_admin}, future))
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                return
+
+            batch = [item]
+            stopping = False
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+            if stopping:
+                return
+
+    async def _flush(self, batch: List[Tuple[dict, asyncio.Future]]) -> None:
+        try:
+            saved = await asyncio.to_thread(self._write, [row for row, _ in batch])
+        except Exception as e:
+            print(f"❌ Ошибка записи пакета сообщений чата: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.messages += len(batch)
+        for (_, future), row in zip(batch, saved):
+            if not future.done():
+                future.set_result(SavedMessage(row.id, row.created_at))
+
+    @staticmethod
+    def _write(rows: List[dict]) -> list:
+        # sort_by_parameter_order: строки RETURNING в порядке параметров, чтобы сопоставить их с ожидающими
+        stmt = insert(ChatMessage).returning(
+            ChatMessage.id, ChatMessage.created_at, sort_by_parameter_order=True
+        )
+        with SessionLocal() as db:
+            try:
+                saved = db.execute(stmt, rows).all()
+                db.commit()
+                return saved
+            except Exception:
+                db.rollback()
+                raise
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.queue.qsize() if self.queue is not None else 0,
+            "batches": self.batches,
+            "messages": self.messages,
+        }
+
+chat_writer = ChatMessageWriter()
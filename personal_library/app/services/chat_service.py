@@ -0,0 +1,59 @@
+from app.repositories.chat_repository import AsyncChatRepository
+from app.schemas.chat import ChatConversationPage, ChatConversationResponse, ChatMessagePage, ChatMessageResponse
+from app.utils.pagination import encode_cursor, decode_cursor
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, Tuple
+
+class AsyncChatService:
+    def __init__(self, db: AsyncSession):
+        self.repository = AsyncChatRepository(db)
+
+    async def get_history(
+        self,
+        user_id: Optional[int],
+        limit: int,
+        before: Optional[str] = None,
+        fields: Optional[Tuple[str, ...]] = None
+    ) -> ChatMessagePage:
+        """Последние limit сообщений или limit сообщений старше курсора before"""
+        after = self._parse_cursor(before)
+        rows = await self.repository.get_history(user_id, limit + 1, after, fields)
+
+        rows, next_cursor = self._split_page(rows, limit, "id")
+
+        if fields is None:
+            items = [ChatMessageResponse.model_validate(row) for row in rows]
+        else:
+            items = [ChatMessageResponse.model_construct(**{field: getattr(row, field) for field in fields}) for row in rows]
+        return ChatMessagePage(items=items, next_cursor=next_cursor)
+
+    async def get_conversations(self, limit: int, before: Optional[str] = None) -> ChatConversationPage:
+        """Список диалогов для администратора, от недавних к давним"""
+        rows = await self.repository.get_conversations(limit + 1, self._parse_cursor(before))
+        rows, next_cursor = self._split_page(rows, limit, "user_id")
+        return ChatConversationPage(
+            items=[ChatConversationResponse.model_validate(row) for row in rows],
+            next_cursor=next_cursor
+        )
+
+    async def mark_conversation_read(self, user_id: int) -> bool:
+        return await self.repository.mark_conversation_read(user_id)
+
+    @staticmethod
+    def _split_page(rows: list, limit: int, id_field: str) -> Tuple[list, Optional[str]]:
+        # Лишняя строка показывает, есть ли записи старше страницы
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        last = rows[-1]
+        return rows, encode_cursor({"created_at": last.cursor_created_at, "id": getattr(last, id_field)})
+
+    @staticmethod
+    def _parse_cursor(cursor: Optional[str]) -> Optional[Tuple[str, int]]:
+        data = decode_cursor(cursor)
+        if data is None:
+            return None
+        created_at, last_id = data.get("created_at"), data.get("id")
+        if not isinstance(created_at, str) or not isinstance(last_id, int):
+            raise ValueError("Неверный курсор")
+        return created_at, last_id
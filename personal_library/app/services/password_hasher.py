@@ -0,0 +1,71 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+
+from app.models.user import User
+
+AUTH_HASH_WORKERS = int(os.getenv("AUTH_HASH_WORKERS", str(os.cpu_count() or 1)))
+AUTH_HASH_QUEUE_LIMIT = int(os.getenv("AUTH_HASH_QUEUE_LIMIT", str(AUTH_HASH_WORKERS * 4)))
+AUTH_RETRY_AFTER_SECONDS = 2
+
+class HasherBusyError(Exception):
+    """Очередь хэширования паролей заполнена, запрос нужно повторить позже"""
+
+class PasswordHasher:
+    """
+    bcrypt в отдельном пуле процессов: хэширование не занимает потоки сервера и не держит GIL.
+    Число ожидающих и выполняемых задач ограничено queue_limit, сверх него запросы отклоняются сразу
+    """
+
+    def __init__(self, workers: int = AUTH_HASH_WORKERS, queue_limit: int = AUTH_HASH_QUEUE_LIMIT):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: дочерние процессы не наследуют потоки и цикл событий сервера
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def _submit(self, func: Callable, *args):
+        if self.in_flight >= self.queue_limit:
+            self.rejected += 1
+            raise HasherBusyError("Слишком много одновременных запросов аутентификации")
+
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+
+    async def hash(self, password: str) -> str:
+        return await self._submit(User.get_password_hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        return await self._submit(User.verify_and_update_password, password, hashed_password)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
+
+password_hasher = PasswordHasher()
@@ -1,32 +1,86 @@
 import asyncio
-import websockets
 import json
-from typing import Set, Dict
+import time
+from typing import Set, Dict, List, Optional
+from fastapi import WebSocket, WebSocketDisconnect
+from app.database import AsyncSessionLocal
+from app.services.broker import Broker, chat_broker
+from app.services.chat_persistence import ChatMessageWriter, chat_writer
+from app.services.chat_service import AsyncChatService
+from app.services.ws_connection import ClientConnection
 from app.utils.jwt import verify_token
+from app.utils.pagination import MAX_PAGE_SIZE
+
+# Каналы брокера: сообщения администраторам, адресные сообщения пользователям, события библиотеки
+CHANNEL_ADMINS = "admins"
+CHANNEL_USERS = "users"
+CHANNEL_LIBRARY = "library"
+
+# За сколько секунд до истечения токена клиенту предлагается прислать reauth
+REAUTH_WINDOW_SECONDS = 60
+
+# Сообщений в ответе get_history, если клиент не указал limit
+HISTORY_PAGE_SIZE = 50
 
 class ChatServer:
     
-    def __init__(self):
-        self.connected_clients: Set[websockets.WebSocketServerProtocol] = set()
+    def __init__(self, broker: Broker = chat_broker, writer: ChatMessageWriter = chat_writer):
+        self.broker = broker
+        self.writer = writer
+
+        self.connected_clients: Set[WebSocket] = set()
+
+        # Исходящие очереди соединений: вся отправка идет через них, а не напрямую в сокет
+        self.connections: Dict[WebSocket, ClientConnection] = {}
+        self.dropped_on_closed = 0
        
-        self.user_connections: Dict[int, websockets.WebSocketServerProtocol] = {}
+        self.user_connections: Dict[int, WebSocket] = {}
         
-        self.admin_connections: Set[websockets.WebSocketServerProtocol] = set()
+        self.admin_connections: Set[WebSocket] = set()
+
+        # Все аутентифицированные соединения пользователя (вкладки, устройства) для событий библиотеки
+        self.library_subscribers: Dict[int, Set[WebSocket]] = {}
+
+        # Цикл событий приложения: синхронные обработчики из пула потоков публикуют события через него
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
         
         print("✅ ChatServer инициализирован")
 
-    async def on_open(self, websocket: websockets.WebSocketServerProtocol):
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        await self.writer.start()
+        await self.broker.start(self.on_broker_message)
+
+    async def stop(self):
+        await self.broker.stop()
+        await self.writer.stop()
+
+    async def on_broker_message(self, channel: str, message: dict):
+        if channel == CHANNEL_ADMINS:
+            await self.send_to_admins(message)
+        elif channel == CHANNEL_USERS:
+            await self.send_to_user(message['user_id'], message['payload'])
+        elif channel == CHANNEL_LIBRARY:
+            await self.send_library_event(message['user_id'], message['payload'])
+
+    async def on_open(self, websocket: WebSocket):
         self.connected_clients.add(websocket)
+        self.connections[websocket] = ClientConnection(websocket)
         print(f"🔗 Новое подключение. Всего клиентов: {len(self.connected_clients)}")
         
-        await websocket.send(json.dumps({
+        self.send(websocket, {
             'type': 'connection_established',
             'message': 'WebSocket соединение установлено. Пройдите аутентификацию.'
-        }))
+        })
 
-    async def on_close(self, websocket: websockets.WebSocketServerProtocol):
+    async def on_close(self, websocket: WebSocket):
         if websocket in self.connected_clients:
             self.connected_clients.remove(websocket)
+
+        connection = self.connections.pop(websocket, None)
+        if connection is not None:
+            self.dropped_on_closed += connection.dropped
+            await connection.close()
         
         user_id = None
         for uid, ws in list(self.user_connections.items()):
@@ -40,20 +94,30 @@ class ChatServer:
         if websocket in self.admin_connections:
             self.admin_connections.remove(websocket)
             print(f"👋 Администратор отключился")
+
+        for uid, sockets in list(self.library_subscribers.items()):
+            sockets.discard(websocket)
+            if not sockets:
+                del self.library_subscribers[uid]
         
         print(f"🔌 Соединение закрыто. Осталось клиентов: {len(self.connected_clients)}")
 
-    async def on_error(self, websocket: websockets.WebSocketServerProtocol, error: Exception):
+    async def on_error(self, websocket: WebSocket, error: Exception):
         print(f"❌ WebSocket ошибка: {error}")
         await self.on_close(websocket)
 
-    async def on_message(self, websocket: websockets.WebSocketServerProtocol, message: str):
+    async def on_message(self, websocket: WebSocket, message: str):
         try:
             data = json.loads(message)
             message_type = data.get('type')
+
+            if message_type not in ('auth', 'reauth') and self.reject_expired(websocket, data):
+                return
             
             if message_type == 'auth':
                 await self.handle_auth(websocket, data)
+            elif message_type == 'reauth':
+                await self.handle_reauth(websocket, data)
             elif message_type == 'message':
                 await self.handle_user_message(websocket, data)
             elif message_type == 'admin_message':
@@ -61,222 +125,331 @@ class ChatServer:
             elif message_type == 'get_history':
                 await self.handle_get_history(websocket, data)
             else:
-                await websocket.send(json.dumps({
+                self.send(websocket, {
                     'type': 'error',
                     'message': 'Неизвестный тип сообщения'
-                }))
+                })
                 
         except json.JSONDecodeError:
-            await websocket.send(json.dumps({
+            self.send(websocket, {
                 'type': 'error',
                 'message': 'Неверный формат JSON'
-            }))
+            })
         except Exception as e:
             print(f"❌ Ошибка обработки сообщения: {e}")
             await self.on_error(websocket, e)
 
-    async def handle_auth(self, websocket: websockets.WebSocketServerProtocol, data: dict):
+    async def handle_auth(self, websocket: WebSocket, data: dict):
+        # Повторный auth мог бы сменить пользователя соединения: продление токена идет только через reauth
+        connection = self.connections.get(websocket)
+        if connection is not None and connection.user_id is not None:
+            self.send(websocket, {
+                'type': 'error',
+                'message': 'Соединение уже аутентифицировано, для нового токена используйте reauth'
+            })
+            return
+
         token = data.get('token')
         user_data = verify_token(token)
         
         if not user_data:
-            await websocket.send(json.dumps({
+            self.send(websocket, {
                 'type': 'auth_error',
                 'message': 'Неверный токен'
-            }))
+            })
             return
 
         user_id = user_data.get('user_id')
         role = user_data.get('role')
+        self.library_subscribers.setdefault(user_id, set()).add(websocket)
+
+        if connection is not None:
+            connection.authenticate(user_data)
+            self.schedule_reauth(websocket, connection)
         
         if role == 'admin':
             self.admin_connections.add(websocket)
-            await websocket.send(json.dumps({
+            self.send(websocket, {
                 'type': 'auth_success',
                 'role': role,
+                'expires_at': user_data.get('exp'),
                 'message': 'Вы подключены как администратор'
-            }))
+            })
             print(f"🛡️ Администратор {user_id} подключился к чату")
         else:
             self.user_connections[user_id] = websocket
-            await websocket.send(json.dumps({
+            self.send(websocket, {
                 'type': 'auth_success',
                 'role': role,
+                'expires_at': user_data.get('exp'),
                 'message': 'Вы подключены к чату поддержки'
-            }))
+            })
             print(f"👤 Пользователь {user_id} подключился к чату")
             
             await self.notify_admins_about_new_user(user_id)
 
-    async def handle_user_message(self, websocket: websockets.WebSocketServerProtocol, data: dict):
-        token = data.get('token')
-        user_data = verify_token(token)
+    async def handle_reauth(self, websocket: WebSocket, data: dict):
+        connection = self.connections.get(websocket)
+        user_data = verify_token(data.get('token'))
+
+        if not user_data or connection is None or connection.user_id is None:
+            self.send(websocket, {
+                'type': 'auth_error',
+                'message': 'Неверный токен'
+            })
+            return
+
+        if user_data.get('user_id') != connection.user_id or user_data.get('role') != connection.role:
+            self.send(websocket, {
+                'type': 'auth_error',
+                'message': 'Токен выдан другому пользователю, переподключитесь'
+            })
+            return
+
+        connection.authenticate(user_data)
+        self.schedule_reauth(websocket, connection)
+        self.send(websocket, {
+            'type': 'reauth_success',
+            'expires_at': connection.expires_at
+        })
+
+    def authenticated(self, websocket: WebSocket) -> Optional[ClientConnection]:
+        """Личность соединения, проверенная при auth: токен не передается и не декодируется в каждом кадре"""
+        connection = self.connections.get(websocket)
+        if connection is None or connection.user_id is None:
+            return None
+        if connection.expires_at is not None and connection.expires_at <= time.time():
+            return None
+        return connection
+
+    def schedule_reauth(self, websocket: WebSocket, connection: ClientConnection):
+        # reauth_required приходит за REAUTH_WINDOW_SECONDS до истечения, даже если клиент ничего не отправляет
+        if connection.expires_at is None:
+            return
+        delay = max(connection.expires_at - REAUTH_WINDOW_SECONDS - time.time(), 0)
+        connection.reauth_timer = asyncio.get_running_loop().call_later(delay, self.request_reauth, websocket)
+
+    def request_reauth(self, websocket: WebSocket):
+        connection = self.connections.get(websocket)
+        if connection is None or connection.reauth_requested:
+            return
+        connection.reauth_timer = None
+        connection.reauth_requested = True
+        self.send(websocket, {
+            'type': 'reauth_required',
+            'expires_at': connection.expires_at
+        })
+
+    def reject_expired(self, websocket: WebSocket, data: dict) -> bool:
+        """
+        Кадр после истечения токена не обрабатывается: клиент получает reauth_required с отклоненным кадром
+        и после reauth отправляет его повторно, поэтому сообщение не теряется
+        """
+        connection = self.connections.get(websocket)
+        if (
+            connection is None or connection.user_id is None
+            or connection.expires_at is None or connection.expires_at > time.time()
+        ):
+            return False
+
+        connection.reauth_requested = True
+        self.send(websocket, {
+            'type': 'reauth_required',
+            'expires_at': connection.expires_at,
+            'rejected': data
+        })
+        return True
+
+    async def handle_user_message(self, websocket: WebSocket, data: dict):
+        connection = self.authenticated(websocket)
         
-        if not user_data:
-            await websocket.send(json.dumps({
+        if connection is None:
+            self.send(websocket, {
                 'type': 'error',
                 'message': 'Требуется аутентификация'
-            }))
+            })
             return
         
-        user_id = user_data.get('user_id')
+        user_id = connection.user_id
         message_text = data.get('message', '').strip()
         
         if not message_text:
-            await websocket.send(json.dumps({
+            self.send(websocket, {
                 'type': 'error',
                 'message': 'Сообщение не может быть пустым'
-            }))
+            })
             return
         
-        from app.database import SessionLocal
-        from app.models.chat import ChatMessage
-        
-        db = SessionLocal()
         try:
-            db_message = ChatMessage(
-                user_id=user_id,
-                message=message_text,
-                is_admin=0  
-            )
-            db.add(db_message)
-            db.commit()
-            db.refresh(db_message)
-            
-            await self.broadcast_to_admins({
-                'type': 'user_message',
-                'user_id': user_id,
-                'message': message_text,
-                'timestamp': db_message.created_at.isoformat(),
-                'message_id': db_message.id
-            })
-            
-            await websocket.send(json.dumps({
-                'type': 'message_sent',
-                'message_id': db_message.id,
-                'timestamp': db_message.created_at.isoformat()
-            }))
-            
-            print(f"💬 Пользователь {user_id} отправил сообщение: {message_text}")
-            
+            saved = await self.writer.save(user_id, message_text, is_admin=0)
         except Exception as e:
             print(f"❌ Ошибка сохранения сообщения: {e}")
-            db.rollback()
-        finally:
-            db.close()
+            return
+        
+        await self.broadcast_to_admins({
+            'type': 'user_message',
+            'user_id': user_id,
+            'message': message_text,
+            'timestamp': saved.created_at.isoformat(),
+            'message_id': saved.id
+        })
+        
+        self.send(websocket, {
+            'type': 'message_sent',
+            'message_id': saved.id,
+            'timestamp': saved.created_at.isoformat()
+        })
+        
+        print(f"💬 Пользователь {user_id} отправил сообщение: {message_text}")
 
-    async def handle_admin_message(self, websocket: websockets.WebSocketServerProtocol, data: dict):
-        token = data.get('token')
-        user_data = verify_token(token)
+    async def handle_admin_message(self, websocket: WebSocket, data: dict):
+        connection = self.authenticated(websocket)
         
-        if not user_data or user_data.get('role') != 'admin':
-            await websocket.send(json.dumps({
+        if connection is None or connection.role != 'admin':
+            self.send(websocket, {
                 'type': 'error',
                 'message': 'Требуются права администратора'
-            }))
+            })
             return
         
         target_user_id = data.get('target_user_id')
         message_text = data.get('message', '').strip()
         
         if not target_user_id or not message_text:
-            await websocket.send(json.dumps({
+            self.send(websocket, {
                 'type': 'error',
                 'message': 'Не указан пользователь или сообщение'
-            }))
+            })
             return
         
-        from app.database import SessionLocal
-        from app.models.chat import ChatMessage
-        
-        db = SessionLocal()
         try:
-            db_message = ChatMessage(
-                user_id=target_user_id,  
-                message=message_text,
-                is_admin=1  
-            )
-            db.add(db_message)
-            db.commit()
-            db.refresh(db_message)
-            
-            if target_user_id in self.user_connections:
-                await self.user_connections[target_user_id].send(json.dumps({
-                    'type': 'admin_message',
-                    'message': message_text,
-                    'timestamp': db_message.created_at.isoformat(),
-                    'message_id': db_message.id
-                }))
-            
-            await websocket.send(json.dumps({
-                'type': 'message_sent',
-                'message_id': db_message.id,
-                'timestamp': db_message.created_at.isoformat()
-            }))
-            
-            print(f"🛡️ Админ ответил пользователю {target_user_id}: {message_text}")
-            
+            saved = await self.writer.save(target_user_id, message_text, is_admin=1)
         except Exception as e:
             print(f"❌ Ошибка сохранения сообщения админа: {e}")
-            db.rollback()
-        finally:
-            db.close()
+            return
+        
+        await self.broker.publish(CHANNEL_USERS, {
+            'user_id': target_user_id,
+            'payload': {
+                'type': 'admin_message',
+                'message': message_text,
+                'timestamp': saved.created_at.isoformat(),
+                'message_id': saved.id
+            }
+        })
+        
+        self.send(websocket, {
+            'type': 'message_sent',
+            'message_id': saved.id,
+            'timestamp': saved.created_at.isoformat()
+        })
+        
+        print(f"🛡️ Админ ответил пользователю {target_user_id}: {message_text}")
 
-    async def handle_get_history(self, websocket: websockets.WebSocketServerProtocol, data: dict):
-        token = data.get('token')
-        user_data = verify_token(token)
+    async def handle_get_history(self, websocket: WebSocket, data: dict):
+        connection = self.authenticated(websocket)
         
-        if not user_data:
-            await websocket.send(json.dumps({
+        if connection is None:
+            self.send(websocket, {
                 'type': 'error',
                 'message': 'Требуется аутентификация'
-            }))
+            })
             return
         
-        from app.database import SessionLocal
-        from app.models.chat import ChatMessage
-        
-        db = SessionLocal()
-        try:
-            user_id = user_data.get('user_id')
-            role = user_data.get('role')
-            
-            if role == 'admin':
-                messages = db.query(ChatMessage).order_by(ChatMessage.created_at).limit(50).all()
-            else:
-                messages = db.query(ChatMessage).filter(
-                    ChatMessage.user_id == user_id
-                ).order_by(ChatMessage.created_at).limit(50).all()
-            
-            await websocket.send(json.dumps({
-                'type': 'chat_history',
-                'messages': [
-                    {
-                        'id': msg.id,
-                        'user_id': msg.user_id,
-                        'message': msg.message,
-                        'is_admin': msg.is_admin,
-                        'created_at': msg.created_at.isoformat()
-                    } for msg in messages
-                ]
-            }))
-            
-        except Exception as e:
-            print(f"❌ Ошибка получения истории: {e}")
-            await websocket.send(json.dumps({
-                'type': 'error',
-                'message': 'Ошибка получения истории сообщений'
-            }))
-        finally:
-            db.close()
+        async with AsyncSessionLocal() as db:
+            try:
+                user_id = None if connection.role == 'admin' else connection.user_id
+                limit = data.get('limit', HISTORY_PAGE_SIZE)
+                if not isinstance(limit, int) or not 1 <= limit <= MAX_PAGE_SIZE:
+                    limit = HISTORY_PAGE_SIZE
+
+                try:
+                    page = await AsyncChatService(db).get_history(user_id, limit, data.get('before'))
+                except ValueError as e:
+                    self.send(websocket, {
+                        'type': 'error',
+                        'message': str(e)
+                    })
+                    return
+                
+                # От новых к старым; next_cursor передается в before для загрузки более старых
+                self.send(websocket, {
+                    'type': 'chat_history',
+                    'messages': [item.model_dump(mode='json', exclude={'email'}) for item in page.items],
+                    'next_cursor': page.next_cursor,
+                    'before': data.get('before')
+                })
+                
+            except Exception as e:
+                print(f"❌ Ошибка получения истории: {e}")
+                self.send(websocket, {
+                    'type': 'error',
+                    'message': 'Ошибка получения истории сообщений'
+                })
 
     async def broadcast_to_admins(self, message: dict):
+        await self.broker.publish(CHANNEL_ADMINS, message)
+
+    def send(self, websocket: WebSocket, message: dict):
+        self.send_json(websocket, json.dumps(message))
+
+    def send_json(self, websocket: WebSocket, message_json: str):
+        connection = self.connections.get(websocket)
+        if connection is not None:
+            connection.send(message_json)
+
+    async def send_to_admins(self, message: dict):
+        # Сериализация один раз; постановка в очереди не ждет получателей
         message_json = json.dumps(message)
-        for admin_ws in self.admin_connections:
-            try:
-                await admin_ws.send(message_json)
-            except Exception as e:
-                print(f"❌ Ошибка отправки админу: {e}")
+        for admin_ws in list(self.admin_connections):
+            self.send_json(admin_ws, message_json)
+
+    async def send_to_user(self, user_id: int, message: dict):
+        websocket = self.user_connections.get(user_id)
+        if websocket is not None:
+            self.send(websocket, message)
+
+    async def send_library_event(self, user_id: int, message: dict):
+        message_json = json.dumps(message)
+        for ws in list(self.library_subscribers.get(user_id, ())):
+            self.send_json(ws, message_json)
+
+    def stats(self) -> dict:
+        connections = [connection.stats() for connection in self.connections.values()]
+        depths = [item["queue_depth"] for item in connections]
+        return {
+            "persistence": self.writer.stats(),
+            "connections": len(connections),
+            "queue_depth_total": sum(depths),
+            "queue_depth_max": max(depths, default=0),
+            "dropped": self.dropped_on_closed + sum(item["dropped"] for item in connections),
+            "per_connection": connections,
+        }
+
+    def publish_library_event(self, user_id: int, action: str, book_ids: Optional[List[int]] = None, **extra):
+        """
+        Уведомление открытых вкладок пользователя об изменении его книг.
+        Безопасно вызывать из любого потока: публикация планируется в цикл событий приложения
+        и не задерживает ответ REST API
+        """
+        if self.loop is None:
+            return
+
+        message = {'type': 'library_event', 'action': action, 'book_ids': book_ids or [], **extra}
+        future = asyncio.run_coroutine_threadsafe(
+            self.broker.publish(CHANNEL_LIBRARY, {'user_id': user_id, 'payload': message}),
+            self.loop
+        )
+        future.add_done_callback(self._log_publish_failure)
+
+    @staticmethod
+    def _log_publish_failure(future) -> None:
+        # Ответ REST API уже отправлен: ошибку публикации остается только записать в лог
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            print(f"❌ Ошибка публикации события библиотеки: {error!r}")
 
     async def notify_admins_about_new_user(self, user_id: int):
         await self.broadcast_to_admins({
@@ -285,12 +458,14 @@ class ChatServer:
             'message': f'Пользователь {user_id} подключился к чату'
         })
 
-    async def handler(self, websocket: websockets.WebSocketServerProtocol):
+    async def handler(self, websocket: WebSocket):
+        await websocket.accept()
         await self.on_open(websocket)
         try:
-            async for message in websocket:
+            while True:
+                message = await websocket.receive_text()
                 await self.on_message(websocket, message)
-        except websockets.exceptions.ConnectionClosed:
+        except WebSocketDisconnect:
             print("🔌 WebSocket соединение закрыто клиентом")
         except Exception as e:
             print(f"❌ Ошибка в WebSocket обработчике: {e}")
@@ -300,9 +475,9 @@ class ChatServer:
 
 chat_server = ChatServer()
 
-async def websocket_handler(websocket: websockets.WebSocketServerProtocol):
+async def websocket_handler(websocket: WebSocket):
     """
-    Обработчик WebSocket соединений
-    Новая сигнатура без параметра path для совместимости с websockets>=11.0
+    Обработчик WebSocket соединений.
+    Подключается как маршрут FastAPI и работает в цикле событий uvicorn, на том же порту, что и REST API
     """
     await chat_server.handler(websocket)
\ No newline at end of file
@@ -0,0 +1,116 @@
+import asyncio
+import os
+from contextlib import suppress
+from typing import Dict, Optional
+
+from fastapi import WebSocket
+
+# Политики для медленного клиента, у которого переполнилась очередь отправки
+DROP_OLDEST = "drop_oldest"
+DISCONNECT = "disconnect"
+
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+WS_SLOW_CONSUMER_POLICY = os.getenv("WS_SLOW_CONSUMER_POLICY", DROP_OLDEST)
+
+# Код закрытия 1013 "Try Again Later" для клиентов, отключенных за отставание
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+class ClientConnection:
+    """
+    Исходящая сторона WebSocket-соединения: ограниченная очередь и отдельная задача-писатель.
+    Отправка не ждет клиента, поэтому медленное соединение не задерживает рассылку остальным
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_queue: int = WS_SEND_QUEUE_SIZE,
+        policy: str = WS_SLOW_CONSUMER_POLICY
+    ):
+        if policy not in (DROP_OLDEST, DISCONNECT):
+            raise ValueError(f"Неизвестная политика для медленных клиентов: {policy}")
+
+        self.websocket = websocket
+        self.policy = policy
+        self.queue: "asyncio.Queue[str]" = asyncio.Queue(maxsize=max_queue)
+        # Личность, проверенная один раз при auth/reauth; expires_at — exp токена (unix time)
+        self.user_id: Optional[int] = None
+        self.role: Optional[str] = None
+        self.expires_at: Optional[float] = None
+        self.reauth_requested = False
+        # Таймер отправки reauth_required перед истечением токена, в том числе для простаивающего клиента
+        self.reauth_timer: Optional[asyncio.TimerHandle] = None
+        self.sent = 0
+        self.dropped = 0
+        self.closed = False
+        self._close_task: Optional[asyncio.Task] = None
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def send(self, message: str) -> bool:
+        """Постановка готового JSON в очередь; False, если сообщение не будет доставлено"""
+        if self.closed:
+            return False
+
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            pass
+
+        if self.policy == DROP_OLDEST:
+            self.queue.get_nowait()
+            self.dropped += 1
+            self.queue.put_nowait(message)
+            return True
+
+        self.dropped += 1
+        self.closed = True
+        print(f"🐢 Клиент {self.user_id} не успевает получать сообщения, соединение закрывается")
+        # Ссылка на задачу, иначе цикл событий держит ее только слабо и она может быть собрана до завершения
+        self._close_task = asyncio.create_task(self.close(SLOW_CONSUMER_CLOSE_CODE))
+        return False
+
+    async def _write_loop(self) -> None:
+        try:
+            while True:
+                message = await self.queue.get()
+                await self.websocket.send_text(message)
+                self.sent += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ Ошибка отправки клиенту {self.user_id}: {e}")
+            self.closed = True
+
+    async def close(self, code: Optional[int] = None) -> None:
+        if self.closed and self._writer.done():
+            return
+        self.closed = True
+        self.cancel_reauth_timer()
+        self._writer.cancel()
+        with suppress(asyncio.CancelledError):
+            await self._writer
+        if code is not None:
+            with suppress(Exception):
+                await self.websocket.close(code=code)
+
+    def authenticate(self, user_data: dict) -> None:
+        self.user_id = user_data.get('user_id')
+        self.role = user_data.get('role')
+        self.expires_at = user_data.get('exp')
+        self.reauth_requested = False
+        self.cancel_reauth_timer()
+
+    def cancel_reauth_timer(self) -> None:
+        if self.reauth_timer is not None:
+            self.reauth_timer.cancel()
+            self.reauth_timer = None
+
+    def stats(self) -> Dict[str, object]:
+        # Без user_id и role: /metrics открыт без аутентификации
+        return {
+            "queue_depth": self.queue.qsize(),
+            "queue_size": self.queue.maxsize,
+            "sent": self.sent,
+            "dropped": self.dropped,
+        }
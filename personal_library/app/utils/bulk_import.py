@@ -0,0 +1,94 @@
+import csv
+import codecs
+import json
+from typing import AsyncIterator, Optional, Tuple
+
+BULK_CHUNK_SIZE = 500
+MAX_REPORTED_ERRORS = 1000
+EXPORT_BATCH_SIZE = 500
+
+NDJSON = "ndjson"
+CSV = "csv"
+
+def detect_format(content_type: Optional[str]) -> str:
+    if content_type and content_type.split(";")[0].strip().lower() in ("text/csv", "application/csv"):
+        return CSV
+    return NDJSON
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, str]]:
+    # utf-8-sig: BOM от Excel не попадает в имя первой колонки CSV и в первую строку NDJSON
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    buffer = ""
+    line_no = 0
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            line_no += 1
+            yield line_no, line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield line_no + 1, buffer.rstrip("\r")
+
+async def iter_records(chunks: AsyncIterator[bytes], fmt: str) -> AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """
+    Построчный разбор потока NDJSON/CSV.
+    Возвращает (номер строки, запись, ошибка разбора)
+    """
+    if fmt == CSV:
+        async for item in _iter_csv_records(chunks):
+            yield item
+        return
+
+    async for line_no, line in iter_lines(chunks):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_no, None, f"Неверный JSON: {e.msg}"
+            continue
+        if not isinstance(record, dict):
+            yield line_no, None, "Ожидался JSON-объект"
+            continue
+        yield line_no, record, None
+
+async def _iter_csv_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, Optional[dict], Optional[str]]]:
+    header = None
+    pending = ""
+    start_line = 0
+    async for line_no, line in iter_lines(chunks):
+        if not pending:
+            start_line = line_no
+            pending = line
+        else:
+            pending += "\n" + line
+
+        # Нечетное число кавычек — поле в кавычках продолжается на следующей строке
+        if pending.count('"') % 2:
+            continue
+
+        text, pending = pending, ""
+        if not text.strip():
+            continue
+
+        try:
+            values = next(csv.reader([text]))
+        except csv.Error as e:
+            yield start_line, None, f"Неверная строка CSV: {e}"
+            continue
+
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield start_line, None, "Количество полей не совпадает с заголовком"
+            continue
+
+        yield start_line, {
+            name: (value if value != "" else None)
+            for name, value in zip(header, values)
+        }, None
+
+    if pending:
+        yield start_line, None, "Незакрытая кавычка в CSV"
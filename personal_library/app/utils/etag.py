@@ -0,0 +1,23 @@
+import hashlib
+from typing import Optional
+from fastapi import Request, Response, status
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha1(":".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:20]
+    return f'"{digest}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header: Optional[str] = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Для If-None-Match используется слабое сравнение (RFC 9110, 13.1.2)
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag in candidates
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers(etag))
+
+def cache_headers(etag: str) -> dict:
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
@@ -0,0 +1,17 @@
+from typing import Iterable, Optional, Tuple
+
+def parse_fields(raw: Optional[str], allowed: Iterable[str]) -> Optional[Tuple[str, ...]]:
+    """
+    Разбор параметра ?fields=a,b,c.
+    None означает все поля; порядок результата совпадает с allowed, чтобы ключи кэша были стабильны
+    """
+    if raw is None or not raw.strip():
+        return None
+
+    allowed = tuple(allowed)
+    requested = {name.strip() for name in raw.split(",") if name.strip()}
+    unknown = requested.difference(allowed)
+    if unknown:
+        raise ValueError(f"Неизвестные поля: {', '.join(sorted(unknown))}")
+
+    return tuple(name for name in allowed if name in requested)
@@ -1,11 +1,79 @@
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
+from collections import OrderedDict
 from typing import Optional, Dict
+import hashlib
+import threading
+import time
 
 SECRET_KEY = "your-secret-key-here"  
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_DAYS = 7
+TOKEN_CACHE_MAX_SIZE = 4096
+
+class VerifiedTokenCache:
+    """
+    LRU уже проверенных токенов: ключ — SHA-256 токена, значение — claims.
+    Запись живет не дольше exp токена; неверные токены не кэшируются
+    """
+
+    def __init__(self, max_size: int = TOKEN_CACHE_MAX_SIZE):
+        self.max_size = max_size
+        self._data: "OrderedDict[bytes, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.decodes = 0
+        self.failures = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self._key(token)
+        with self._lock:
+            claims = self._data.get(key)
+            if claims is None:
+                return None
+            if claims.get("exp", 0) <= time.time():
+                del self._data[key]
+                self.expirations += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return dict(claims)
+
+    def set(self, token: str, claims: dict) -> None:
+        key = self._key(token)
+        with self._lock:
+            self._data[key] = dict(claims)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def record_decode(self, ok: bool) -> None:
+        with self._lock:
+            self.decodes += 1
+            if not ok:
+                self.failures += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "decodes": self.decodes,
+                "failures": self.failures,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+            }
+
+token_cache = VerifiedTokenCache()
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -26,14 +94,25 @@ def create_refresh_token(data: dict):
     return encoded_jwt
 
 def verify_token(token: str):
+    if not token:
+        return None
+
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
     except JWTError:
+        token_cache.record_decode(ok=False)
         return None
 
-def refresh_tokens(refresh_token: str) -> Optional[Dict[str, str]]:
-    payload = verify_token(refresh_token)
+    token_cache.record_decode(ok=True)
+    token_cache.set(token, payload)
+    return payload
+
+def refresh_tokens(payload: Optional[dict]) -> Optional[Dict[str, str]]:
+    """Новая пара токенов по уже проверенному refresh-токену"""
     if not payload or payload.get("type") != "refresh":
         return None
     
@@ -0,0 +1,22 @@
+from typing import Any, Optional
+from fastapi import Response
+from pydantic import TypeAdapter
+
+def json_response(
+    adapter: TypeAdapter,
+    value: Any,
+    headers: Optional[dict] = None,
+    status_code: int = 200,
+    include: Optional[Any] = None
+) -> Response:
+    """
+    Сериализация в байты заранее собранным TypeAdapter.
+    Возврат готового Response отключает повторную проверку по response_model в FastAPI.
+    include ограничивает набор полей в ответе (разреженные выборки ?fields=)
+    """
+    return Response(
+        content=adapter.dump_json(value, include=include),
+        media_type="application/json",
+        headers=headers,
+        status_code=status_code
+    )
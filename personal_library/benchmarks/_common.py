@@ -0,0 +1,42 @@
+"""Общая подготовка бенчмарков: временная база, заполненная книгами"""
+import os
+import sys
+import tempfile
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def prepare_database(users: int, books_per_user: int) -> None:
+    # library.db задан относительным путем, поэтому база создается во временном каталоге
+    os.chdir(tempfile.mkdtemp(prefix="library-bench-"))
+    sys.path.insert(0, ROOT)
+
+    from sqlalchemy import insert
+    from app.database import SessionLocal, create_tables
+    from app.models.book import Book, BookStatus
+    from app.models.user import User
+
+    create_tables()
+    statuses = list(BookStatus)
+    with SessionLocal() as db:
+        db.execute(insert(User), [
+            {"id": user_id, "email": f"user{user_id}@example.com", "hashed_password": "-"}
+            for user_id in range(1, users + 1)
+        ])
+        db.execute(insert(Book), [
+            {
+                "title": f"Книга {n}",
+                "author": f"Автор {n % 50}",
+                "genre": "Роман",
+                "description": "Описание книги. " * 10,
+                "rating": n % 5 + 1,
+                "favorite_quotes": "Цитата из книги.",
+                "start_date": date(2025, n % 12 + 1, 1),
+                "end_date": date(2025, n % 12 + 1, 28),
+                "status": statuses[n % len(statuses)],
+                "user_id": user_id,
+            }
+            for user_id in range(1, users + 1)
+            for n in range(books_per_user)
+        ])
+        db.commit()
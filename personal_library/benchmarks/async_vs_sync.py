@@ -0,0 +1,87 @@
+"""
+Сравнение синхронного и асинхронного доступа к БД при большом числе одновременных клиентов.
+
+Синхронный путь повторяет то, как FastAPI выполняет обычные def-эндпоинты: Session в пуле
+из 40 потоков. Асинхронный — AsyncSession на aiosqlite, как в текущих контроллерах.
+Каждый клиент читает книги одного пользователя и собирает BookResponse.
+
+Запуск из каталога personal_library:
+    python benchmarks/async_vs_sync.py --clients 500
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from _common import prepare_database
+
+# Пул потоков anyio, в котором FastAPI запускает синхронные эндпоинты
+SYNC_THREADS = 40
+
+def report(name: str, latencies: list, elapsed: float) -> None:
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(
+        f"{name:6} клиентов: {len(latencies):4}  всего: {elapsed:6.2f} с  "
+        f"запросов/с: {len(latencies) / elapsed:8.1f}  "
+        f"p50: {statistics.median(latencies) * 1000:7.1f} мс  p95: {p95 * 1000:7.1f} мс"
+    )
+
+async def run_sync(clients: int, users: int) -> None:
+    from app.database import SessionLocal
+    from app.repositories.book_repository import BookQueries
+    from app.schemas.book import BookResponse
+
+    def request(user_id: int) -> None:
+        with SessionLocal() as db:
+            rows = db.execute(BookQueries.rows_by_user_id(user_id)).all()
+            [BookResponse.from_row(row) for row in rows]
+
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=SYNC_THREADS) as pool:
+        started = time.perf_counter()
+        # Задержка считается с момента поступления запроса, включая ожидание свободного потока
+        async def client(user_id: int) -> float:
+            queued = time.perf_counter()
+            await loop.run_in_executor(pool, request, user_id)
+            return time.perf_counter() - queued
+
+        latencies = await asyncio.gather(*(client(i % users + 1) for i in range(clients)))
+        report("sync", latencies, time.perf_counter() - started)
+
+async def run_async(clients: int, users: int) -> None:
+    from app.database import AsyncSessionLocal
+    from app.repositories.book_repository import AsyncBookRepository
+    from app.schemas.book import BookResponse
+
+    async def client(user_id: int) -> float:
+        started = time.perf_counter()
+        async with AsyncSessionLocal() as db:
+            rows = await AsyncBookRepository(db).get_rows_by_user_id(user_id)
+            [BookResponse.from_row(row) for row in rows]
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    latencies = await asyncio.gather(*(client(i % users + 1) for i in range(clients)))
+    report("async", latencies, time.perf_counter() - started)
+
+async def main(args) -> None:
+    await run_sync(args.clients, args.users)
+    await run_async(args.clients, args.users)
+    # Второй проход: оба пути уже прогреты
+    await run_sync(args.clients, args.users)
+    await run_async(args.clients, args.users)
+
+    from app.database import async_engine
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--books", type=int, default=100, help="Книг на пользователя")
+    args = parser.parse_args()
+
+    prepare_database(args.users, args.books)
+    asyncio.run(main(args))
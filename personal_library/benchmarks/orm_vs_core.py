@@ -0,0 +1,72 @@
+"""
+Время и память на загрузку 10k книг: ORM-сущности Book против строк Core (Row).
+
+ORM — db.scalars(select(Book)): объект на строку, identity map и отслеживание состояния.
+Core — db.execute(BookQueries.rows_all()): кортежеподобные Row без сессионного учета.
+Память меряется tracemalloc: пик во время загрузки и то, что остается, пока результат жив.
+
+Запуск из каталога personal_library:
+    python benchmarks/orm_vs_core.py --books 10000
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+from _common import prepare_database
+
+def measure_time(repeat: int, load) -> float:
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        load()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+def measure_memory(load) -> tuple:
+    gc.collect()
+    tracemalloc.start()
+    # Результат держится живым, чтобы учесть память, которую он занимает после загрузки
+    result = load()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return peak, retained
+
+def main(args) -> None:
+    from sqlalchemy import select
+    from app.database import SessionLocal
+    from app.models.book import Book
+    from app.repositories.book_repository import BookQueries
+
+    # Каждый прогон — новая сессия, как в отдельном запросе; иначе ORM возьмет объекты из identity map
+    def load_orm():
+        with SessionLocal() as db:
+            return db.scalars(select(Book)).all()
+
+    def load_core():
+        with SessionLocal() as db:
+            return db.execute(BookQueries.rows_all()).all()
+
+    count = len(load_core())
+    assert count == len(load_orm()), "ORM и Core вернули разное число строк"
+
+    print(f"книг: {count}, время — лучший из {args.repeat} прогонов")
+    for name, load in (("orm", load_orm), ("core", load_core)):
+        elapsed = measure_time(args.repeat, load)
+        peak, retained = measure_memory(load)
+        print(
+            f"{name:5} время: {elapsed * 1000:7.1f} мс ({elapsed / count * 1e6:5.2f} мкс/строка)  "
+            f"пик: {peak / 2**20:6.1f} МБ  удерживается: {retained / 2**20:6.1f} МБ "
+            f"({retained / count:6.0f} Б/строка)"
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--books", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    prepare_database(1, args.books)
+    main(args)
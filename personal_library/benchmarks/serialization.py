@@ -0,0 +1,65 @@
+"""
+Стоимость сериализации одной книги в ответе списка: до и после пути без повторной валидации.
+
+"До" повторяет прежний путь: BookResponse.model_validate для каждой строки, затем обработка
+response_model в FastAPI (model_dump, повторная валидация, dump в JSON-совместимые объекты, json.dumps).
+"После" — BookResponse.from_row и один dump_json заранее собранного TypeAdapter.
+
+Запуск из каталога personal_library:
+    python benchmarks/serialization.py --books 10000
+"""
+import argparse
+import json
+import time
+
+from _common import prepare_database
+
+def best_of(repeat: int, func) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+def main(args) -> None:
+    from typing import List
+    from pydantic import TypeAdapter
+    from app.database import SessionLocal
+    from app.repositories.book_repository import BookQueries
+    from app.schemas.book import BookResponse
+
+    with SessionLocal() as db:
+        rows = db.execute(BookQueries.rows_by_user_id(1)).all()
+
+    list_adapter = TypeAdapter(List[BookResponse])
+
+    def before() -> bytes:
+        items = [BookResponse.model_validate(row) for row in rows]
+        # fastapi.routing.serialize_response: модели превращаются в dict и валидируются заново
+        content = [item.model_dump(by_alias=True) for item in items]
+        validated = list_adapter.validate_python(content)
+        data = list_adapter.dump_python(validated, mode="json")
+        return json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+    def after() -> bytes:
+        return list_adapter.dump_json([BookResponse.from_row(row) for row in rows])
+
+    assert json.loads(before()) == json.loads(after()), "Пути сериализации дают разный JSON"
+
+    count = len(rows)
+    before_time = best_of(args.repeat, before)
+    after_time = best_of(args.repeat, after)
+    print(f"книг: {count}, лучший из {args.repeat} прогонов")
+    print(f"до:    {before_time * 1000:8.1f} мс  {before_time / count * 1e6:6.1f} мкс/книга")
+    print(f"после: {after_time * 1000:8.1f} мс  {after_time / count * 1e6:6.1f} мкс/книга")
+    print(f"ускорение: {before_time / after_time:.2f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--books", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    prepare_database(1, args.books)
+    main(args)
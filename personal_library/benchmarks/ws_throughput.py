@@ -0,0 +1,135 @@
+"""
+Пропускная способность чата: сообщений пользователей в секунду на одно ядро.
+
+Кадры проходят через ChatServer.on_message: разбор JSON, проверка личности, рассылка администраторам
+через брокер в памяти и очереди ClientConnection до send_text. Запись в БД заменена мгновенной,
+чтобы мерить обработку кадра, а не fsync. Сравниваются:
+  identity — личность проверена один раз при auth (текущий путь);
+  cached   — токен в каждом кадре и verify_token с попаданием в кэш проверенных токенов;
+  decode   — токен в каждом кадре и полная проверка подписи JWT без кэша.
+Время — process_time: цикл событий однопоточный, поэтому это время одного ядра.
+
+Запуск из каталога personal_library:
+    python benchmarks/ws_throughput.py --messages 20000
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import sys
+import time
+from datetime import datetime
+
+from _common import ROOT
+
+# Кадров между уступками циклу событий: задачи-писатели успевают опустошить очереди
+YIELD_EVERY = 50
+
+class FakeWebSocket:
+    def __init__(self):
+        self.received = 0
+
+    async def send_text(self, message: str) -> None:
+        self.received += 1
+
+    async def close(self, code: int = 1000) -> None:
+        pass
+
+class InstantWriter:
+    """Запись сообщений без БД: id выдаются по порядку, коммит мгновенный"""
+
+    def __init__(self):
+        self.messages = 0
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def save(self, user_id: int, message: str, is_admin: int):
+        from app.services.chat_persistence import SavedMessage
+        self.messages += 1
+        return SavedMessage(self.messages, datetime.utcnow())
+
+    def stats(self) -> dict:
+        return {"messages": self.messages}
+
+async def run(mode: str, args) -> None:
+    from app.services.broker import InMemoryBroker
+    from app.services.websocket_server import ChatServer
+    from app.utils.jwt import create_access_token, token_cache, verify_token
+
+    class PerFrameTokenServer(ChatServer):
+        """Прежний путь: токен приходит в каждом кадре и проверяется заново"""
+
+        async def handle_user_message(self, websocket, data):
+            if not verify_token(data.get('token')):
+                self.send(websocket, {'type': 'error', 'message': 'Неверный токен'})
+                return
+            await super().handle_user_message(websocket, data)
+
+    token_cache.max_size = 0 if mode == "decode" else 4096
+    server_class = ChatServer if mode == "identity" else PerFrameTokenServer
+
+    # Служебные print сервера не должны попадать в вывод, но их стоимость одинакова для всех режимов
+    with contextlib.redirect_stdout(io.StringIO()):
+        server = server_class(broker=InMemoryBroker(), writer=InstantWriter())
+        await server.start()
+
+        admins = [FakeWebSocket() for _ in range(args.admins)]
+        users = [FakeWebSocket() for _ in range(args.users)]
+        tokens = {}
+        for index, websocket in enumerate(admins + users, start=1):
+            role = "admin" if websocket in admins else "user"
+            tokens[websocket] = create_access_token({"user_id": index, "email": f"u{index}@example.com", "role": role})
+            await server.on_open(websocket)
+            await server.on_message(websocket, json.dumps({"type": "auth", "token": tokens[websocket]}))
+
+        frames = []
+        for websocket in users:
+            frame = {"type": "message", "message": "Здравствуйте, не могу найти книгу в каталоге"}
+            if mode != "identity":
+                frame["token"] = tokens[websocket]
+            frames.append((websocket, json.dumps(frame, ensure_ascii=False)))
+
+        await asyncio.sleep(0)
+        started_cpu = time.process_time()
+        started_wall = time.perf_counter()
+        for i in range(args.messages):
+            websocket, frame = frames[i % len(frames)]
+            await server.on_message(websocket, frame)
+            if i % YIELD_EVERY == 0:
+                await asyncio.sleep(0)
+        while any(connection.queue.qsize() for connection in server.connections.values()):
+            await asyncio.sleep(0)
+        cpu = time.process_time() - started_cpu
+        wall = time.perf_counter() - started_wall
+
+        stats = server.stats()
+        for websocket in list(server.connections):
+            await server.on_close(websocket)
+        await server.stop()
+
+    assert stats["dropped"] == 0, "Очереди переполнились, измерение неточно"
+    delivered = sum(websocket.received for websocket in admins)
+    print(
+        f"{mode:8} сообщений/с на ядро: {args.messages / cpu:9.0f}  "
+        f"мкс/сообщение: {cpu / args.messages * 1e6:6.1f}  "
+        f"доставлено администраторам: {delivered}  стена: {wall:5.2f} с"
+    )
+
+async def main(args) -> None:
+    for mode in ("identity", "cached", "decode"):
+        await run(mode, args)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--admins", type=int, default=2)
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    asyncio.run(main(args))
@@ -0,0 +1,22 @@
+import hashlib
+import os
+import tempfile
+
+import pytest
+
+# До импорта app: движки app.database привязываются к пути базы при импорте
+os.environ["LIBRARY_DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="library-test-"), "library.db")
+
+REPO_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "library.db")
+
+def digest(path: str) -> str:
+    if not os.path.exists(path):
+        return ""
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+@pytest.fixture(scope="session", autouse=True)
+def repo_database_untouched():
+    before = digest(REPO_DB)
+    yield
+    assert digest(REPO_DB) == before, "Тесты изменили library.db репозитория"
@@ -0,0 +1,68 @@
+"""SQLiteBroker доставляет сообщения между процессами: каждый процесс получает все опубликованные, включая свои"""
+import asyncio
+import multiprocessing
+
+from sqlalchemy import create_engine
+
+from app.services.broker import SQLiteBroker, broker_metadata
+
+WORKERS = 3
+MESSAGES_PER_WORKER = 50
+RECEIVE_TIMEOUT_SECONDS = 20
+
+async def run_worker(url: str, worker: int, ready, results) -> None:
+    expected = WORKERS * MESSAGES_PER_WORKER
+    received = []
+    done = asyncio.Event()
+
+    async def handler(channel: str, message: dict) -> None:
+        received.append((channel, message["worker"], message["n"]))
+        if len(received) >= expected:
+            done.set()
+
+    broker = SQLiteBroker(url=url, poll_interval=0.01)
+    await broker.start(handler)
+    # Публикация только после запуска всех процессов: каждый читает сообщения, появившиеся после его старта
+    await asyncio.to_thread(ready.wait)
+    for n in range(MESSAGES_PER_WORKER):
+        await broker.publish("admins", {"worker": worker, "n": n})
+
+    try:
+        await asyncio.wait_for(done.wait(), RECEIVE_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        pass
+    await broker.stop()
+    results.put((worker, received))
+
+def worker_main(url: str, worker: int, ready, results) -> None:
+    asyncio.run(run_worker(url, worker, ready, results))
+
+def test_messages_reach_every_process(tmp_path):
+    path = tmp_path / "broker.db"
+    # Таблица создается заранее, чтобы процессы не создавали ее одновременно
+    engine = create_engine(f"sqlite:///{path}")
+    broker_metadata.create_all(engine)
+    engine.dispose()
+
+    context = multiprocessing.get_context("spawn")
+    ready = context.Barrier(WORKERS)
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker_main, args=(f"sqlite+aiosqlite:///{path}", worker, ready, results))
+        for worker in range(WORKERS)
+    ]
+    for process in processes:
+        process.start()
+
+    received = dict(results.get(timeout=RECEIVE_TIMEOUT_SECONDS + 30) for _ in processes)
+    for process in processes:
+        process.join(timeout=10)
+        assert process.exitcode == 0
+
+    expected = {("admins", worker, n) for worker in range(WORKERS) for n in range(MESSAGES_PER_WORKER)}
+    for worker in range(WORKERS):
+        assert len(received[worker]) == len(expected)
+        assert set(received[worker]) == expected
+        # Сообщения одного отправителя приходят в порядке публикации
+        for sender in range(WORKERS):
+            assert [n for _, w, n in received[worker] if w == sender] == list(range(MESSAGES_PER_WORKER))
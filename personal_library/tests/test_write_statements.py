@@ -0,0 +1,74 @@
+"""Каждая запись книги — один SQL-оператор: INSERT/UPDATE/DELETE ... RETURNING с проверкой владельца в WHERE"""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app.main import app
+from app.utils.jwt import create_access_token
+
+@pytest.fixture(scope="module")
+def client():
+    # Временная база из conftest создается при старте приложения через create_tables()
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture
+def statements():
+    from app.database import async_engine
+
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+
+def auth(user_id: int) -> dict:
+    token = create_access_token({"user_id": user_id, "email": f"user{user_id}@example.com", "role": "user"})
+    return {"Authorization": f"Bearer {token}"}
+
+def create_book(client, user_id: int = 1) -> dict:
+    response = client.post("/books/", data={"title": "Книга", "author": "Автор", "genre": "Роман"}, headers=auth(user_id))
+    assert response.status_code == 201
+    return response.json()
+
+def test_create_is_one_statement(client, statements):
+    book = create_book(client)
+    assert book["title"] == "Книга"
+    assert len(statements) == 1
+    assert statements[0].lstrip().upper().startswith("INSERT")
+
+def test_patch_is_one_statement(client, statements):
+    book = create_book(client)
+    statements.clear()
+
+    response = client.patch(f"/books/{book['id']}", json={"rating": 5}, headers=auth(1))
+    assert response.status_code == 200
+    assert response.json()["rating"] == 5
+    assert len(statements) == 1
+    assert statements[0].lstrip().upper().startswith("UPDATE")
+
+@pytest.mark.parametrize("user_id, book_id", [(1, 999999), (2, None)])
+def test_patch_missing_or_foreign_is_one_statement(client, statements, user_id, book_id):
+    book_id = book_id or create_book(client)["id"]
+    statements.clear()
+
+    response = client.patch(f"/books/{book_id}", json={"rating": 4}, headers=auth(user_id))
+    assert response.status_code == 404
+    assert len(statements) == 1
+
+def test_delete_is_one_statement(client, statements):
+    book = create_book(client)
+    statements.clear()
+
+    response = client.delete(f"/books/{book['id']}", headers=auth(1))
+    assert response.status_code == 200
+    assert len(statements) == 1
+    assert statements[0].lstrip().upper().startswith("DELETE")
+
+    statements.clear()
+    response = client.delete(f"/books/{book['id']}", headers=auth(1))
+    assert response.status_code == 404
+    assert len(statements) == 1